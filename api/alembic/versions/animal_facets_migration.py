@@ -0,0 +1,98 @@
+"""Trigger-maintained facet counts for animals
+
+Revision ID: 6f1a85b2c334
+Revises: 5e0f74a1b223
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6f1a85b2c334'
+down_revision = '5e0f74a1b223'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('animal_facets',
+        sa.Column('facet', sa.String(), nullable=False),
+        sa.Column('value', sa.String(), nullable=False),
+        sa.Column('count', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.PrimaryKeyConstraint('facet', 'value')
+    )
+
+    # Прибавляет delta к счетчикам всех фасетов строки (удаленные с сайта животные не считаются)
+    op.execute("""
+        CREATE FUNCTION animal_facets_apply(r animals, delta integer) RETURNS void AS $$
+        BEGIN
+            IF r.removed_at IS NOT NULL THEN
+                RETURN;
+            END IF;
+            INSERT INTO animal_facets (facet, value, count)
+            SELECT f.facet, f.value, delta
+            FROM (VALUES ('gender', r.gender),
+                         ('age', r.age),
+                         ('shelter_id', r.shelter_id::text),
+                         ('is_adopted', r.is_adopted::text)) AS f(facet, value)
+            WHERE f.value IS NOT NULL
+            ON CONFLICT (facet, value) DO UPDATE SET count = animal_facets.count + EXCLUDED.count;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE FUNCTION animal_facets_trigger() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'TRUNCATE' THEN
+                DELETE FROM animal_facets;
+                RETURN NULL;
+            END IF;
+            IF TG_OP = 'UPDATE'
+               AND (OLD.gender, OLD.age, OLD.shelter_id, OLD.is_adopted, OLD.removed_at IS NULL)
+                   IS NOT DISTINCT FROM
+                   (NEW.gender, NEW.age, NEW.shelter_id, NEW.is_adopted, NEW.removed_at IS NULL) THEN
+                RETURN NULL;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                PERFORM animal_facets_apply(OLD, -1);
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                PERFORM animal_facets_apply(NEW, 1);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER animals_facets_row
+        AFTER INSERT OR DELETE OR UPDATE OF gender, age, shelter_id, is_adopted, removed_at ON animals
+        FOR EACH ROW EXECUTE FUNCTION animal_facets_trigger()
+    """)
+    op.execute("""
+        CREATE TRIGGER animals_facets_truncate
+        AFTER TRUNCATE ON animals
+        FOR EACH STATEMENT EXECUTE FUNCTION animal_facets_trigger()
+    """)
+
+    # Начальное заполнение по текущим данным
+    op.execute("""
+        INSERT INTO animal_facets (facet, value, count)
+        SELECT f.facet, f.value, count(*)
+        FROM animals a
+        CROSS JOIN LATERAL (VALUES ('gender', a.gender),
+                                  ('age', a.age),
+                                  ('shelter_id', a.shelter_id::text),
+                                  ('is_adopted', a.is_adopted::text)) AS f(facet, value)
+        WHERE a.removed_at IS NULL AND f.value IS NOT NULL
+        GROUP BY f.facet, f.value
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS animals_facets_truncate ON animals")
+    op.execute("DROP TRIGGER IF EXISTS animals_facets_row ON animals")
+    op.execute("DROP FUNCTION IF EXISTS animal_facets_trigger()")
+    op.execute("DROP FUNCTION IF EXISTS animal_facets_apply(animals, integer)")
+    op.drop_table('animal_facets')
@@ -0,0 +1,90 @@
+"""Statement-level facet count triggers for animals
+
+Revision ID: 9c4db8e5f667
+Revises: 8b3ca7d4e556
+Create Date: 2026-10-17 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c4db8e5f667'
+down_revision = '8b3ca7d4e556'
+branch_labels = None
+depends_on = None
+
+
+# Строчный триггер обновлял общие строки animal_facets на каждую строку animals: писатели
+# вставали в очередь на них, а блокировки в разном порядке приводили к взаимоблокировкам.
+# Теперь дельты всей команды суммируются по таблицам переходов и применяются одним
+# INSERT ... ON CONFLICT в порядке (facet, value), так что блокировки берутся в одном порядке.
+def _apply_deltas(changed: str) -> str:
+    return f"""
+                INSERT INTO animal_facets (facet, value, count)
+                SELECT f.facet, f.value, sum(c.delta)
+                FROM ({changed}) AS c
+                CROSS JOIN LATERAL (VALUES ('gender', c.gender),
+                                          ('age', c.age),
+                                          ('shelter_id', c.shelter_id::text),
+                                          ('is_adopted', c.is_adopted::text)) AS f(facet, value)
+                WHERE f.value IS NOT NULL
+                GROUP BY f.facet, f.value
+                HAVING sum(c.delta) <> 0
+                ORDER BY f.facet, f.value
+                ON CONFLICT (facet, value) DO UPDATE SET count = animal_facets.count + EXCLUDED.count;"""
+
+
+NEW_ROWS = "SELECT gender, age, shelter_id, is_adopted, 1 AS delta FROM new_rows WHERE removed_at IS NULL"
+OLD_ROWS = "SELECT gender, age, shelter_id, is_adopted, -1 AS delta FROM old_rows WHERE removed_at IS NULL"
+
+
+def upgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS animals_facets_row ON animals")
+
+    # Таблицы переходов допускают только одно событие на триггер, поэтому триггеров три.
+    # UPDATE без списка столбцов (с таблицами переходов он запрещен): строки, у которых
+    # фасеты не изменились, дают нулевую дельту и отбрасываются HAVING
+    op.execute(f"""
+        CREATE FUNCTION animal_facets_statement_trigger() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN{_apply_deltas(NEW_ROWS)}
+            ELSIF TG_OP = 'UPDATE' THEN{_apply_deltas(f"{NEW_ROWS} UNION ALL {OLD_ROWS}")}
+            ELSIF TG_OP = 'DELETE' THEN{_apply_deltas(OLD_ROWS)}
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER animals_facets_insert
+        AFTER INSERT ON animals
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION animal_facets_statement_trigger()
+    """)
+    op.execute("""
+        CREATE TRIGGER animals_facets_update
+        AFTER UPDATE ON animals
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION animal_facets_statement_trigger()
+    """)
+    op.execute("""
+        CREATE TRIGGER animals_facets_delete
+        AFTER DELETE ON animals
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION animal_facets_statement_trigger()
+    """)
+    # animals_facets_truncate остается прежним: animal_facets_trigger() очищает счетчики
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS animals_facets_delete ON animals")
+    op.execute("DROP TRIGGER IF EXISTS animals_facets_update ON animals")
+    op.execute("DROP TRIGGER IF EXISTS animals_facets_insert ON animals")
+    op.execute("DROP FUNCTION IF EXISTS animal_facets_statement_trigger()")
+    op.execute("""
+        CREATE TRIGGER animals_facets_row
+        AFTER INSERT OR DELETE OR UPDATE OF gender, age, shelter_id, is_adopted, removed_at ON animals
+        FOR EACH ROW EXECUTE FUNCTION animal_facets_trigger()
+    """)
@@ -0,0 +1,47 @@
+"""Trigger-maintained data version counter for animals
+
+Revision ID: 8b3ca7d4e556
+Revises: 7a2b96c3d445
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b3ca7d4e556'
+down_revision = '7a2b96c3d445'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('data_versions',
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('version', sa.BigInteger(), server_default=sa.text('0'), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+    op.execute("INSERT INTO data_versions (name, version) VALUES ('animals', 0)")
+
+    # Счетчик увеличивается в транзакции писателя, поэтому меняется при каждом ее коммите
+    # (в отличие от max(updated_at): now() - время начала транзакции, а удаления его не двигают)
+    op.execute("""
+        CREATE FUNCTION animals_data_version_trigger() RETURNS trigger AS $$
+        BEGIN
+            UPDATE data_versions SET version = version + 1 WHERE name = 'animals';
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER animals_data_version
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON animals
+        FOR EACH STATEMENT EXECUTE FUNCTION animals_data_version_trigger()
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS animals_data_version ON animals")
+    op.execute("DROP FUNCTION IF EXISTS animals_data_version_trigger()")
+    op.drop_table('data_versions')
@@ -0,0 +1,81 @@
+"""Bump the animals data version only for statements that changed rows
+
+Revision ID: a1f5c9f60778
+Revises: 9c4db8e5f667
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1f5c9f60778'
+down_revision = '9c4db8e5f667'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS animals_data_version ON animals")
+
+    # Команды, не затронувшие ни одной строки (например, UPDATE ... WHERE без совпадений),
+    # не меняют версию: иначе ETag сбрасывался бы без изменения данных.
+    # Таблицы переходов допускают только одно событие на триггер, поэтому триггеров три;
+    # для DELETE проверяется old_rows, для INSERT и UPDATE - new_rows
+    op.execute("""
+        CREATE FUNCTION animals_data_version_rows_trigger() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                IF NOT EXISTS (SELECT 1 FROM old_rows) THEN
+                    RETURN NULL;
+                END IF;
+            ELSIF NOT EXISTS (SELECT 1 FROM new_rows) THEN
+                RETURN NULL;
+            END IF;
+            UPDATE data_versions SET version = version + 1 WHERE name = 'animals';
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER animals_data_version_insert
+        AFTER INSERT ON animals
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION animals_data_version_rows_trigger()
+    """)
+    op.execute("""
+        CREATE TRIGGER animals_data_version_update
+        AFTER UPDATE ON animals
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION animals_data_version_rows_trigger()
+    """)
+    op.execute("""
+        CREATE TRIGGER animals_data_version_delete
+        AFTER DELETE ON animals
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION animals_data_version_rows_trigger()
+    """)
+    # TRUNCATE не дает таблиц переходов; версия меняется безусловно прежней функцией
+    op.execute("""
+        CREATE TRIGGER animals_data_version_truncate
+        AFTER TRUNCATE ON animals
+        FOR EACH STATEMENT EXECUTE FUNCTION animals_data_version_trigger()
+    """)
+
+    # ETag больше не строится по max(updated_at), индекс только замедлял запись
+    op.drop_index('ix_animals_updated_at', table_name='animals')
+
+
+def downgrade() -> None:
+    op.create_index('ix_animals_updated_at', 'animals', ['updated_at'], unique=False)
+    op.execute("DROP TRIGGER IF EXISTS animals_data_version_truncate ON animals")
+    op.execute("DROP TRIGGER IF EXISTS animals_data_version_delete ON animals")
+    op.execute("DROP TRIGGER IF EXISTS animals_data_version_update ON animals")
+    op.execute("DROP TRIGGER IF EXISTS animals_data_version_insert ON animals")
+    op.execute("DROP FUNCTION IF EXISTS animals_data_version_rows_trigger()")
+    op.execute("""
+        CREATE TRIGGER animals_data_version
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON animals
+        FOR EACH STATEMENT EXECUTE FUNCTION animals_data_version_trigger()
+    """)
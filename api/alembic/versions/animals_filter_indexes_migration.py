@@ -0,0 +1,39 @@
+"""Indexes for animals list filters
+
+Revision ID: 4d9e63fb0a12
+Revises: 3c8d52eaf901
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4d9e63fb0a12'
+down_revision = '3c8d52eaf901'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Уникальный индекс по source_url уже создан в 2b7c41d9e8f0 (ключ ON CONFLICT)
+    # Доступные животные - основной сценарий фронтенда (is_adopted=false, сортировка по id)
+    op.create_index('ix_animals_available', 'animals', ['id'], unique=False,
+                    postgresql_where=sa.text('is_adopted = false AND removed_at IS NULL'))
+    # Фильтр по приюту и статусу усыновления
+    op.create_index('ix_animals_shelter_status', 'animals', ['shelter_id', 'is_adopted', 'id'], unique=False,
+                    postgresql_where=sa.text('removed_at IS NULL'))
+    # Фильтр по полу/возрасту и SELECT DISTINCT gender
+    op.create_index('ix_animals_gender_age', 'animals', ['gender', 'age', 'id'], unique=False,
+                    postgresql_where=sa.text('removed_at IS NULL'))
+    # Фильтр по возрасту и SELECT DISTINCT age
+    op.create_index('ix_animals_age', 'animals', ['age'], unique=False,
+                    postgresql_where=sa.text('removed_at IS NULL'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_animals_age', table_name='animals')
+    op.drop_index('ix_animals_gender_age', table_name='animals')
+    op.drop_index('ix_animals_shelter_status', table_name='animals')
+    op.drop_index('ix_animals_available', table_name='animals')
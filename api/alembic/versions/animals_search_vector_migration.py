@@ -0,0 +1,34 @@
+"""Full-text search vector on animals
+
+Revision ID: 7a2b96c3d445
+Revises: 6f1a85b2c334
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '7a2b96c3d445'
+down_revision = '6f1a85b2c334'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Заполняется скрапером при вставке/обновлении (см. search_vector в scripts/run_scraper.py)
+    op.add_column('animals', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+    op.execute("""
+        UPDATE animals
+        SET search_vector = setweight(to_tsvector('spanish', coalesce(name, '')), 'A')
+                         || setweight(to_tsvector('spanish', coalesce(description, '')), 'B')
+    """)
+    op.create_index('ix_animals_search_vector', 'animals', ['search_vector'], unique=False,
+                    postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_animals_search_vector', table_name='animals')
+    op.drop_column('animals', 'search_vector')
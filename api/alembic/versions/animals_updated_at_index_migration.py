@@ -0,0 +1,26 @@
+"""Index on animals.updated_at for ETag versions
+
+Revision ID: 5e0f74a1b223
+Revises: 4d9e63fb0a12
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e0f74a1b223'
+down_revision = '4d9e63fb0a12'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # max(updated_at) - версия данных для ETag, читается одним шагом по индексу
+    op.execute("UPDATE animals SET updated_at = COALESCE(created_at, now()) WHERE updated_at IS NULL")
+    op.create_index('ix_animals_updated_at', 'animals', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_animals_updated_at', table_name='animals')
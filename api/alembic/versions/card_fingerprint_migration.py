@@ -0,0 +1,24 @@
+"""Listing card fingerprint for animals
+
+Revision ID: 3c8d52eaf901
+Revises: 2b7c41d9e8f0
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c8d52eaf901'
+down_revision = '2b7c41d9e8f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('animals', sa.Column('card_fingerprint', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('animals', 'card_fingerprint')
@@ -0,0 +1,29 @@
+"""Incremental sync columns for animals
+
+Revision ID: 2b7c41d9e8f0
+Revises: 1234567890ab
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2b7c41d9e8f0'
+down_revision = '1234567890ab'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('animals', sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True))
+    op.add_column('animals', sa.Column('removed_at', sa.DateTime(timezone=True), nullable=True))
+    # Ключ для INSERT ... ON CONFLICT / Conflict target for INSERT ... ON CONFLICT
+    op.create_index(op.f('ix_animals_source_url'), 'animals', ['source_url'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_animals_source_url'), table_name='animals')
+    op.drop_column('animals', 'removed_at')
+    op.drop_column('animals', 'updated_at')
@@ -0,0 +1,188 @@
+import functools
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from time import monotonic
+from typing import Any, Callable, Dict, Iterator, Optional, TypeVar
+
+import anyio
+import anyio.to_thread
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class PoolTimeout(Exception):
+    """Не удалось получить соединение из пула за отведенное время"""
+
+
+class DatabasePool:
+    """
+    Пул соединений с PostgreSQL для всего процесса.
+
+    Поверх ThreadedConnectionPool добавляет ожидание свободного соединения с таймаутом
+    (psycopg2 сразу бросает PoolError), проверку простаивавших соединений и метрики.
+    """
+
+    def __init__(self, minconn: int, maxconn: int, timeout: float = 5.0,
+                 health_check_interval: float = 30.0, **dsn: Any) -> None:
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._pool = ThreadedConnectionPool(minconn, maxconn, **dsn)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._last_used: Dict[int, float] = {}
+        self._in_use = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _is_healthy(self, conn) -> bool:
+        """Проверяет соединение, если оно долго простаивало"""
+        if conn.closed:
+            return False
+        idle = monotonic() - self._last_used.get(id(conn), 0.0)
+        if idle < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn) -> None:
+        with self._lock:
+            self._discarded += 1
+            self._last_used.pop(id(conn), None)
+        self._pool.putconn(conn, close=True)
+
+    def _checkout(self):
+        while True:
+            conn = self._pool.getconn()
+            if self._is_healthy(conn):
+                return conn
+            logger.warning("Discarding broken database connection")
+            self._discard(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """
+        Выдает соединение из пула и возвращает его обратно.
+        Незафиксированная транзакция откатывается, сломанное соединение закрывается.
+        """
+        started = monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._timeouts += 1
+            raise PoolTimeout(f"No database connection available within {self.timeout}s")
+        try:
+            conn = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+
+        waited = monotonic() - started
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        try:
+            yield conn
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            try:
+                if conn.closed:
+                    self._discard(conn)
+                else:
+                    conn.rollback()
+                    self._last_used[id(conn)] = monotonic()
+                    self._pool.putconn(conn)
+            except psycopg2.Error:
+                self._discard(conn)
+            finally:
+                self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Метрики пула"""
+        with self._lock:
+            return {
+                "min_size": self.minconn,
+                "max_size": self.maxconn,
+                "in_use": self._in_use,
+                "idle": len(self._pool._pool),
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "discarded": self._discarded,
+                "avg_wait_ms": round(self._wait_total / self._checkouts * 1000, 3) if self._checkouts else 0.0,
+                "max_wait_ms": round(self._wait_max * 1000, 3)
+            }
+
+    def close(self) -> None:
+        self._pool.closeall()
+
+
+def connection_params() -> Dict[str, str]:
+    """Параметры подключения к базе данных из окружения"""
+    return {
+        'host': os.getenv('POSTGRES_HOST', 'db'),
+        'database': os.getenv('POSTGRES_DB', 'scrapy4paws'),
+        'user': os.getenv('POSTGRES_USER', 'postgres'),
+        'password': os.getenv('POSTGRES_PASSWORD', 'postgres'),
+        'port': os.getenv('POSTGRES_PORT', '5432')
+    }
+
+
+_pool: Optional[DatabasePool] = None
+_limiter: Optional[anyio.CapacityLimiter] = None
+
+
+def init_pool() -> DatabasePool:
+    """Создает пул соединений процесса (вызывается при старте приложения)"""
+    global _pool
+    if _pool is None:
+        _pool = DatabasePool(
+            minconn=int(os.getenv('DB_POOL_MIN', '1')),
+            maxconn=int(os.getenv('DB_POOL_MAX', '10')),
+            timeout=float(os.getenv('DB_POOL_TIMEOUT', '5')),
+            health_check_interval=float(os.getenv('DB_POOL_HEALTH_CHECK_INTERVAL', '30')),
+            **connection_params()
+        )
+        logger.info(f"Database pool created: min={_pool.minconn}, max={_pool.maxconn}")
+    return _pool
+
+
+def get_pool() -> DatabasePool:
+    if _pool is None:
+        raise RuntimeError("Database pool is not initialized")
+    return _pool
+
+
+def close_pool() -> None:
+    global _pool, _limiter
+    _limiter = None
+    if _pool is not None:
+        _pool.close()
+        _pool = None
+
+
+async def run_db(func: Callable[..., T], *args: Any) -> T:
+    """
+    Выполняет блокирующую функцию работы с БД в пуле потоков, не блокируя event loop.
+    Число потоков ограничено размером пула соединений, чтобы потоки не простаивали в ожидании соединения.
+    """
+    global _limiter
+    if _limiter is None:
+        _limiter = anyio.CapacityLimiter(get_pool().maxconn)
+    return await anyio.to_thread.run_sync(functools.partial(func, *args), limiter=_limiter)
@@ -0,0 +1,192 @@
+import hashlib
+import io
+import logging
+import os
+import sqlite3
+import threading
+from time import time
+from typing import Callable, Dict, Optional, Tuple
+
+import requests
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'thumbnails')
+THUMBNAIL_MEDIA_TYPE = "image/jpeg"
+
+
+class ImageTooLarge(Exception):
+    """Исходное изображение превышает допустимый размер загрузки"""
+
+
+def download_image(url: str, timeout: float = 10, max_bytes: int = 10 * 1024 * 1024) -> bytes:
+    """Загружает изображение потоково, не читая больше max_bytes"""
+    with requests.get(url, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+        data = bytearray()
+        for chunk in response.iter_content(64 * 1024):
+            data.extend(chunk)
+            if len(data) > max_bytes:
+                raise ImageTooLarge(f"Image larger than {max_bytes} bytes: {url}")
+        return bytes(data)
+
+
+class ThumbnailCache:
+    """
+    Дисковый кэш миниатюр фотографий животных.
+
+    Исходное изображение загружается один раз, уменьшается до size x size и сохраняется
+    как JPEG с именем по SHA-256 содержимого, так что одинаковые фото хранятся одним файлом.
+    Соответствие URL -> хэш и время последнего обращения хранятся в SQLite; при превышении
+    max_bytes удаляются давно не запрошенные файлы. Индекс общий для API и скрапера.
+    """
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = 200 * 1024 * 1024,
+                 size: int = 400, quality: int = 80,
+                 fetch: Optional[Callable[[str], bytes]] = None) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = size
+        self.quality = quality
+        self.fetch = fetch or download_image
+        self._lock = threading.Lock()
+        # Блокировки по URL: параллельные запросы одной картинки загружают ее один раз
+        self._url_locks: Dict[str, threading.Lock] = {}
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(directory, 'index.sqlite'), check_same_thread=False, timeout=30)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS thumbnails (
+                url TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_thumbnails_digest ON thumbnails (digest)")
+        self._conn.commit()
+
+    def path_for(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], f"{digest}.jpg")
+
+    def lookup(self, url: str) -> Optional[Tuple[str, str]]:
+        """Хэш и путь готовой миниатюры; отмечает обращение"""
+        with self._lock:
+            row = self._conn.execute("SELECT digest FROM thumbnails WHERE url = ?", (url,)).fetchone()
+            if not row:
+                return None
+            path = self.path_for(row[0])
+            if not os.path.exists(path):
+                # Файл удален вне кэша - загрузим заново
+                self._conn.execute("DELETE FROM thumbnails WHERE url = ?", (url,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE thumbnails SET accessed_at = ? WHERE url = ?", (time(), url))
+            self._conn.commit()
+            return row[0], path
+
+    def contains(self, url: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM thumbnails WHERE url = ?", (url,)).fetchone() is not None
+
+    def make_thumbnail(self, data: bytes) -> bytes:
+        """Уменьшенная копия в JPEG с учетом EXIF-ориентации"""
+        with Image.open(io.BytesIO(data)) as image:
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((self.size, self.size))
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+            output = io.BytesIO()
+            image.save(output, format="JPEG", quality=self.quality, optimize=True, progressive=True)
+            return output.getvalue()
+
+    def get(self, url: str) -> Tuple[str, str]:
+        """Хэш и путь миниатюры для URL; при промахе загружает и уменьшает изображение"""
+        cached = self.lookup(url)
+        if cached:
+            return cached
+
+        with self._lock:
+            url_lock = self._url_locks.setdefault(url, threading.Lock())
+        try:
+            with url_lock:
+                return self._create(url)
+        finally:
+            # Блокировка убирается и при ошибке загрузки, иначе она останется в словаре навсегда
+            with self._lock:
+                self._url_locks.pop(url, None)
+
+    def _create(self, url: str) -> Tuple[str, str]:
+        """Загружает и сохраняет миниатюру (под блокировкой URL)"""
+        cached = self.lookup(url)
+        if cached:
+            return cached
+        thumbnail = self.make_thumbnail(self.fetch(url))
+        digest = hashlib.sha256(thumbnail).hexdigest()
+        path = self.path_for(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Запись через временный файл: читатели не увидят недописанную миниатюру
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(thumbnail)
+            os.replace(temp_path, path)
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO thumbnails (url, digest, size, accessed_at) VALUES (?, ?, ?, ?)",
+                (url, digest, len(thumbnail), time())
+            )
+            self._evict(keep=digest)
+            self._conn.commit()
+        return digest, path
+
+    def read_digest(self, digest: str) -> Optional[bytes]:
+        """Содержимое миниатюры по хэшу (None, если файла нет); отмечает обращение"""
+        try:
+            with open(self.path_for(digest), "rb") as f:
+                thumbnail = f.read()
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self._conn.execute("UPDATE thumbnails SET accessed_at = ? WHERE digest = ?", (time(), digest))
+            self._conn.commit()
+        return thumbnail
+
+    def _evict(self, keep: str) -> None:
+        """Удаляет давно не запрошенные файлы сверх лимита (keep - только что сохраненный)"""
+        files = self._conn.execute("""
+            SELECT digest, MAX(size), MAX(accessed_at) AS last_access
+            FROM thumbnails GROUP BY digest ORDER BY last_access
+        """).fetchall()
+        total = sum(size for _, size, _ in files)
+        for digest, size, _ in files:
+            if total <= self.max_bytes:
+                break
+            if digest == keep:
+                continue
+            self._conn.execute("DELETE FROM thumbnails WHERE digest = ?", (digest,))
+            try:
+                os.remove(self.path_for(digest))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            urls, files, total = self._conn.execute("""
+                SELECT COUNT(*), COUNT(DISTINCT digest),
+                       COALESCE((SELECT SUM(size) FROM (SELECT MAX(size) AS size FROM thumbnails GROUP BY digest)), 0)
+                FROM thumbnails
+            """).fetchone()
+        return {"urls": urls, "files": files, "bytes": total, "max_bytes": self.max_bytes}
+
+
+def thumbnail_cache_from_env(fetch: Optional[Callable[[str], bytes]] = None) -> ThumbnailCache:
+    """Создает кэш миниатюр с настройками из окружения"""
+    return ThumbnailCache(
+        directory=os.getenv('IMAGE_CACHE_DIR', DEFAULT_CACHE_DIR),
+        max_bytes=int(float(os.getenv('IMAGE_CACHE_MAX_MB', '200')) * 1024 * 1024),
+        size=int(os.getenv('THUMBNAIL_SIZE', '400')),
+        fetch=fetch
+    )
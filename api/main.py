@@ -1,17 +1,33 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Path, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Optional
-import psycopg2
+from fastapi.responses import RedirectResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
+from itertools import chain
+from typing import Dict, Iterator, List, Optional, Tuple
+import base64
+import csv
+import hashlib
+import hmac
+import io
+import json
 import os
+import random
+import threading
 from dotenv import load_dotenv
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, TypeAdapter
+from psycopg2.extras import execute_values
 import logging
 import sys
 
+from db_pool import init_pool, get_pool, close_pool, run_db, PoolTimeout
+from response_cache import cache_from_env
+from image_cache import THUMBNAIL_MEDIA_TYPE, thumbnail_cache_from_env
+
 # Настройка логирования для Docker
 logging.basicConfig(
-    level=logging.INFO,
+    level=os.getenv('LOG_LEVEL', 'INFO').upper(),
     format='%(asctime)s - %(levelname)s - %(message)s',
     handlers=[
         logging.StreamHandler(sys.stdout)
@@ -22,11 +38,36 @@ logger = logging.getLogger(__name__)
 # Загрузка переменных окружения
 load_dotenv()
 
+# Кэш ответов на чтение (сбрасывается при обновлениях и после скрапера)
+response_cache = cache_from_env()
+LIST_CACHE_TAG = "animals:list"
+
+# Общий секрет для сброса кэша (X-Cache-Token); без него сброс через API отключен
+CACHE_INVALIDATE_TOKEN = os.getenv('API_CACHE_INVALIDATE_TOKEN', '')
+
+def animal_cache_tag(animal_id: int) -> str:
+    return f"animal:{animal_id}"
+
+# Миниатюры фотографий на диске (исходное изображение загружается один раз)
+thumbnail_cache = thumbnail_cache_from_env()
+# Миниатюры отдаются по URL с хэшем содержимого, который никогда не меняется, поэтому кэшируются
+# навсегда; перенаправление с URL по id перепроверяется (no-cache) и при смене фото ведет на новый хэш
+THUMBNAIL_CACHE_CONTROL = "public, max-age=31536000, immutable"
+THUMBNAIL_REDIRECT_CACHE_CONTROL = "no-cache"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Пул соединений создается при старте и закрывается при остановке приложения"""
+    init_pool()
+    yield
+    close_pool()
+
 # Создание FastAPI приложения
 app = FastAPI(
     title="Scrapy4Paws API",
     description="API для доступа к данным о животных",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Настройка CORS
@@ -36,63 +77,378 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 # Pydantic модели для ответа и обновления
+# Поля, кроме id, необязательны: при выборке fields= в ответ попадают только запрошенные
 class AnimalResponse(BaseModel):
     id: int
-    name: str
-    age: str
-    gender: str
-    description: str
-    birth_date: datetime
-    image_url: str
-    source_url: str
-    shelter_id: int
-    is_adopted: bool
+    name: Optional[str] = None
+    age: Optional[str] = None
+    gender: Optional[str] = None
+    description: Optional[str] = None
+    birth_date: Optional[datetime] = None
+    image_url: Optional[str] = None
+    source_url: Optional[str] = None
+    shelter_id: Optional[int] = None
+    is_adopted: Optional[bool] = None
 
 class AnimalUpdate(BaseModel):
     is_adopted: bool
 
-# Функция для подключения к базе данных
-def get_db_connection():
-    return psycopg2.connect(
-        host=os.getenv('POSTGRES_HOST', 'db'),
-        database=os.getenv('POSTGRES_DB', 'scrapy4paws'),
-        user=os.getenv('POSTGRES_USER', 'postgres'),
-        password=os.getenv('POSTGRES_PASSWORD', 'postgres'),
-        port=os.getenv('POSTGRES_PORT', '5432')
-    )
+# Максимум пар (id, is_adopted) в одном пакетном запросе
+MAX_BULK_UPDATES = 1000
 
-# Модели данных
-class Animal:
-    def __init__(self, id: int, name: str, age: str, gender: str, 
-                 description: str, birth_date: datetime, image_url: str, 
-                 source_url: str, shelter_id: int, is_adopted: bool = False):
-        self.id = id
-        self.name = name
-        self.age = age
-        self.gender = gender
-        self.description = description
-        self.birth_date = birth_date
-        self.image_url = image_url
-        self.source_url = source_url
-        self.shelter_id = shelter_id
-        self.is_adopted = is_adopted
-
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "name": self.name,
-            "age": self.age,
-            "gender": self.gender,
-            "description": self.description,
-            "birth_date": self.birth_date.isoformat() if self.birth_date else None,
-            "image_url": self.image_url,
-            "source_url": self.source_url,
-            "shelter_id": self.shelter_id,
-            "is_adopted": self.is_adopted
-        }
+class AnimalStatusUpdate(BaseModel):
+    id: int
+    is_adopted: bool
+
+class BulkStatusUpdate(BaseModel):
+    updates: List[AnimalStatusUpdate] = Field(..., min_length=1, max_length=MAX_BULK_UPDATES)
+
+# Валидация и сериализация списка в JSON за один проход pydantic-core
+ANIMAL_LIST_ADAPTER = TypeAdapter(List[AnimalResponse])
+
+# Колонки, доступные для выборки через fields=
+ANIMAL_FIELDS = ("id", "name", "age", "gender", "description", "birth_date",
+                 "image_url", "source_url", "shelter_id", "is_adopted")
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+# Доля строк, попадающих в DEBUG-лог (0 - построчное логирование выключено)
+ROW_LOG_SAMPLE_RATE = float(os.getenv('API_ROW_LOG_SAMPLE_RATE', '0'))
+# Сколько строк за раз забирает серверный курсор экспорта
+EXPORT_BATCH_SIZE = 1000
+# Выгрузка держит соединение пула, пока клиент скачивает ответ; одновременных выгрузок
+# меньше, чем соединений, чтобы медленные клиенты не заняли весь пул
+EXPORT_MAX_CONCURRENT = max(1, min(int(os.getenv('API_EXPORT_MAX_CONCURRENT', '2')),
+                                   int(os.getenv('DB_POOL_MAX', '10')) - 1))
+EXPORT_RETRY_AFTER = 30
+export_slots = threading.BoundedSemaphore(EXPORT_MAX_CONCURRENT)
+# Словарь полнотекстового поиска (search_vector заполняется скрапером с той же конфигурацией)
+SEARCH_CONFIG = "spanish"
+MAX_SEARCH_LENGTH = 200
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8"
+}
+
+def encode_cursor(last_id: int, rank: Optional[float] = None) -> str:
+    """Непрозрачный токен следующей страницы (при поиске - вместе с рангом последней строки)"""
+    position = {"id": last_id} if rank is None else {"id": last_id, "rank": rank}
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[int, Optional[float]]:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        position = json.loads(base64.urlsafe_b64decode(padded))
+        rank = position.get("rank")
+        return int(position["id"]), float(rank) if rank is not None else None
+    except (ValueError, KeyError, TypeError, AttributeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def parse_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    """Список колонок для выборки; id включается всегда"""
+    if not fields:
+        return ANIMAL_FIELDS
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in ANIMAL_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return tuple(field for field in ANIMAL_FIELDS if field == "id" or field in requested)
+
+def build_animals_query(age: Optional[str], gender: Optional[str], shelter_id: Optional[int],
+                        is_adopted: Optional[bool], columns: Tuple[str, ...] = ANIMAL_FIELDS,
+                        after_id: Optional[int] = None, limit: Optional[int] = None,
+                        q: Optional[str] = None, after_rank: Optional[float] = None) -> Tuple[str, list]:
+    """
+    Собирает SQL запрос списка животных с фильтрами и keyset-пагинацией по id.
+    С q= выбираются только совпадения по search_vector (GIN-индекс), отсортированные
+    по рангу; последней колонкой возвращается ранг, а пагинация идет по (rank, id).
+    """
+    params = []
+    if q:
+        # Ранг приводится к float8, чтобы значение из курсора сравнивалось без потери точности
+        rank = "ts_rank(search_vector, query)::float8"
+        query = f"""
+            SELECT {', '.join(columns)}, {rank} AS rank
+            FROM animals, websearch_to_tsquery('{SEARCH_CONFIG}', %s) AS query
+            WHERE removed_at IS NULL AND search_vector @@ query
+        """
+        params.append(q)
+        logger.info(f"Adding search: {q}")
+    else:
+        # Базовый SQL запрос (имена колонок берутся только из ANIMAL_FIELDS)
+        query = f"""
+            SELECT {', '.join(columns)}
+            FROM animals 
+            WHERE removed_at IS NULL
+        """
+    
+    # Добавляем фильтры
+    if age:
+        query += " AND age = %s"
+        params.append(age)
+        logger.info(f"Adding age filter: {age}")
+    if gender:
+        query += " AND gender = %s"
+        params.append(gender)
+        logger.info(f"Adding gender filter: {gender}")
+    if shelter_id:
+        query += " AND shelter_id = %s"
+        params.append(shelter_id)
+        logger.info(f"Adding shelter_id filter: {shelter_id}")
+    if is_adopted is not None:
+        query += " AND is_adopted = %s"
+        params.append(is_adopted)
+        logger.info(f"Adding is_adopted filter: {is_adopted}")
+
+    if q:
+        if after_id is not None:
+            query += f" AND ({rank} < %s OR ({rank} = %s AND id > %s))"
+            params.extend([after_rank, after_rank, after_id])
+        query += " ORDER BY rank DESC, id"
+    else:
+        if after_id is not None:
+            query += " AND id > %s"
+            params.append(after_id)
+        query += " ORDER BY id"
+    if limit is not None:
+        query += " LIMIT %s"
+        params.append(limit)
+    return query, params
+
+# Функции доступа к данным (блокирующие, выполняются в пуле потоков через run_db)
+def select_data_version(cur) -> str:
+    """Версия данных таблицы animals: счетчик, который триггер увеличивает при любой записи (миграция 8b3ca7d4e556)"""
+    cur.execute("SELECT version FROM data_versions WHERE name = 'animals'")
+    row = cur.fetchone()
+    return str(row[0]) if row else "empty"
+
+def make_etag(version: str, key: tuple) -> str:
+    """Сильный ETag: одинаковые версия данных и параметры дают одинаковое тело ответа"""
+    return '"' + hashlib.sha1(repr((version, key)).encode("utf-8")).hexdigest() + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
+
+def select_animals(age: Optional[str], gender: Optional[str], shelter_id: Optional[int],
+                   is_adopted: Optional[bool], columns: Tuple[str, ...],
+                   after_id: Optional[int], limit: int, cache_key: tuple,
+                   if_none_match: Optional[str] = None, q: Optional[str] = None,
+                   after_rank: Optional[float] = None) -> Tuple[str, Optional[List[dict]], Optional[str]]:
+    """
+    Возвращает ETag, страницу животных и курсор следующей страницы.
+    Если ETag совпал с If-None-Match, читаются только id (и ранг) для курсора, а вместо страницы
+    возвращается None.
+    """
+    with get_pool().connection() as conn, conn.cursor() as cur:
+        etag = make_etag(select_data_version(cur), cache_key)
+        unchanged = etag_matches(if_none_match, etag)
+        if unchanged:
+            columns = ("id",)
+
+        # Запрашиваем на одну строку больше, чтобы узнать, есть ли следующая страница
+        query, params = build_animals_query(age, gender, shelter_id, is_adopted, columns, after_id, limit + 1,
+                                            q, after_rank)
+        logger.info(f"Executing query: {query}")
+        logger.info(f"With parameters: {params}")
+        
+        # Выполняем запрос
+        cur.execute(query, params)
+        rows = cur.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        # При поиске ранг последней строки страницы - часть курсора
+        next_cursor = encode_cursor(rows[limit - 1][0], rows[limit - 1][-1] if q else None)
+    if unchanged:
+        return etag, None, next_cursor
+    if q:
+        rows = [row[:-1] for row in rows]
+    animals = rows_to_animals(columns, rows[:limit])
+    logger.info(f"Total animals returned: {len(animals)}")
+    return etag, animals, next_cursor
+
+def rows_to_animals(columns: Tuple[str, ...], rows: List[tuple]) -> List[dict]:
+    """Строки БД в словари; построчное логирование только в DEBUG и с выборкой"""
+    animals = [dict(zip(columns, row)) for row in rows]
+    if ROW_LOG_SAMPLE_RATE > 0 and logger.isEnabledFor(logging.DEBUG):
+        for animal in animals:
+            if random.random() < ROW_LOG_SAMPLE_RATE:
+                logger.debug(f"Animal row: {animal}")
+    return animals
+
+def encode_animals(animals: List[dict]) -> bytes:
+    """Единственный шаг валидации по AnimalResponse и сразу JSON-байты"""
+    return ANIMAL_LIST_ADAPTER.dump_json(ANIMAL_LIST_ADAPTER.validate_python(animals), exclude_unset=True)
+
+def json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def stream_animals_export(export_format: str, age: Optional[str], gender: Optional[str],
+                          shelter_id: Optional[int], is_adopted: Optional[bool]) -> Iterator[bytes]:
+    """
+    Построчная выгрузка через серверный (именованный) курсор.
+    Первый chunk отдается сразу после выполнения запроса (заголовок CSV или пустой для NDJSON),
+    далее - пачками по EXPORT_BATCH_SIZE строк, так что память не зависит от размера таблицы.
+    """
+    with get_pool().connection() as conn:
+        with conn.cursor(name="animals_export") as cur:
+            cur.itersize = EXPORT_BATCH_SIZE
+            query, params = build_animals_query(age, gender, shelter_id, is_adopted)
+            cur.execute(query, params)
+
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            if export_format == "csv":
+                writer.writerow(ANIMAL_FIELDS)
+            yield buffer.getvalue().encode("utf-8")
+
+            while True:
+                rows = cur.fetchmany(EXPORT_BATCH_SIZE)
+                if not rows:
+                    break
+                buffer.seek(0)
+                buffer.truncate()
+                if export_format == "csv":
+                    writer.writerows(
+                        [value.isoformat() if isinstance(value, datetime) else value for value in row]
+                        for row in rows
+                    )
+                else:
+                    for row in rows:
+                        buffer.write(json.dumps(dict(zip(ANIMAL_FIELDS, row)), default=json_default, ensure_ascii=False))
+                        buffer.write("\n")
+                yield buffer.getvalue().encode("utf-8")
+
+def release_after(stream: Iterator[bytes], slot: threading.BoundedSemaphore) -> Iterator[bytes]:
+    """Освобождает слот выгрузки, когда поток закончился, упал или был закрыт при отключении клиента"""
+    try:
+        yield from stream
+    finally:
+        slot.release()
+
+def select_animal(animal_id: int) -> Optional[Tuple[Optional[dict], str]]:
+    """
+    Возвращает животное и его ETag (по updated_at строки).
+    Для животного, снятого с сайта приюта (removed_at), вместо словаря возвращается None.
+    """
+    with get_pool().connection() as conn, conn.cursor() as cur:
+        cur.execute(f"""
+            SELECT {', '.join(ANIMAL_FIELDS)}, updated_at, removed_at
+            FROM animals 
+            WHERE id = %s
+        """, (animal_id,))
+        
+        row = cur.fetchone()
+        if not row:
+            return None
+        version = row[-2].isoformat() if row[-2] else "none"
+        animal = dict(zip(ANIMAL_FIELDS, row)) if row[-1] is None else None
+        return animal, make_etag(version, ("animal", animal_id))
+
+def select_image_url(animal_id: int) -> Optional[str]:
+    with get_pool().connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT image_url FROM animals WHERE id = %s", (animal_id,))
+        row = cur.fetchone()
+        return row[0] if row else None
+
+def update_animal_statuses(statuses: Dict[int, bool]) -> Dict[int, str]:
+    """
+    Применяет статусы усыновления одним запросом UPDATE ... FROM (VALUES ...) в одной транзакции.
+    Возвращает исход по каждому id: updated, unchanged (статус уже такой) или not_found.
+    """
+    with get_pool().connection() as conn, conn.cursor() as cur:
+        # Неизменные строки не переписываются: updated_at (ETag) и счетчики фасетов остаются прежними
+        rows = execute_values(cur, """
+            WITH v (id, is_adopted) AS (VALUES %s),
+            updated AS (
+                UPDATE animals AS a
+                SET is_adopted = v.is_adopted, updated_at = now()
+                FROM v
+                WHERE a.id = v.id AND a.is_adopted IS DISTINCT FROM v.is_adopted
+                RETURNING a.id
+            )
+            SELECT v.id, a.id IS NOT NULL, u.id IS NOT NULL
+            FROM v
+            LEFT JOIN animals AS a ON a.id = v.id
+            LEFT JOIN updated AS u ON u.id = v.id
+        """, list(statuses.items()), template="(%s::integer, %s::boolean)",
+            page_size=len(statuses), fetch=True)
+        conn.commit()
+
+    outcomes = {}
+    for animal_id, found, updated in rows:
+        outcomes[animal_id] = "updated" if updated else "unchanged" if found else "not_found"
+    return outcomes
+
+def update_animal_status(animal_id: int, is_adopted: bool) -> bool:
+    """Возвращает False, если животное не найдено"""
+    return update_animal_statuses({animal_id: is_adopted})[animal_id] != "not_found"
+
+def select_table_columns() -> List[dict]:
+    with get_pool().connection() as conn, conn.cursor() as cur:
+        # Получаем информацию о структуре таблицы
+        cur.execute("""
+            SELECT column_name, data_type 
+            FROM information_schema.columns 
+            WHERE table_name = 'animals'
+        """)
+        
+        columns = []
+        for row in cur.fetchall():
+            columns.append({
+                "name": row[0],
+                "type": row[1]
+            })
+        return columns
+
+def select_facets() -> dict:
+    """
+    Значения фильтров и число животных для каждого из них.
+    Счетчики хранятся в animal_facets и поддерживаются триггером при каждой записи в animals,
+    поэтому запрос читает несколько строк независимо от размера таблицы.
+    """
+    with get_pool().connection() as conn, conn.cursor() as cur:
+        cur.execute("""
+            SELECT f.facet, f.value, f.count, s.name
+            FROM animal_facets f
+            LEFT JOIN shelters s ON f.facet = 'shelter_id' AND s.id::text = f.value
+            WHERE f.count > 0
+            ORDER BY f.facet, f.count DESC, f.value
+        """)
+        facets = {"gender": [], "age": [], "shelter": [], "is_adopted": []}
+        for facet, value, count, shelter_name in cur.fetchall():
+            if facet == "shelter_id":
+                facets["shelter"].append({"value": int(value), "name": shelter_name, "count": count})
+            elif facet == "is_adopted":
+                facets["is_adopted"].append({"value": value == "true", "count": count})
+            else:
+                facets[facet].append({"value": value, "count": count})
+        return facets
+
+def select_distinct_values() -> dict:
+    # Уникальные значения берутся из предрассчитанных фасетов вместо SELECT DISTINCT
+    facets = select_facets()
+    genders = [item["value"] for item in facets["gender"]]
+    ages = [item["value"] for item in facets["age"]]
+    
+    return {
+        "genders": genders,
+        "ages": ages
+    }
+
+def not_modified(etag: str, next_cursor: Optional[str] = None) -> Response:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return Response(status_code=304, headers=headers)
 
 # Эндпоинты
 @app.get("/")
@@ -100,99 +456,169 @@ async def root():
     """Корневой эндпоинт для проверки работоспособности API"""
     return {"message": "Scrapy4Paws API is running"}
 
-@app.get("/api/animals", response_model=List[AnimalResponse])
+@app.get("/api/animals", response_model=List[AnimalResponse], response_model_exclude_unset=True)
 async def get_animals(
+    age: Optional[str] = None,
+    gender: Optional[str] = None,
+    shelter_id: Optional[int] = None,
+    is_adopted: Optional[bool] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    q: Optional[str] = Query(None, max_length=MAX_SEARCH_LENGTH),
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Получение списка животных с возможностью фильтрации.
+    Постраничная выдача по id: курсор следующей страницы возвращается в заголовке X-Next-Cursor.
+    fields= - список колонок через запятую (id включается всегда).
+    q= - полнотекстовый поиск по имени и описанию (синтаксис websearch: "frases", OR, -palabra);
+    результаты упорядочены по релевантности, курсор работает так же.
+    Поддерживает ETag / If-None-Match: при неизменных данных возвращается 304 без тела.
+    """
+    columns = parse_fields(fields)
+    q = q.strip() if q else None
+    after_id, after_rank = decode_cursor(cursor) if cursor else (None, None)
+    if q and after_id is not None and after_rank is None:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # Ключ кэша по нормализованным параметрам
+    cache_key = ("animals", age, gender, shelter_id, is_adopted, columns, after_id, limit, q, after_rank)
+    cached = response_cache.get(cache_key)
+    if cached is None:
+        # Поколение снимается до запроса: ответ, прочитанный до сброса кэша, не будет сохранен
+        generation = response_cache.generation(LIST_CACHE_TAG)
+        try:
+            etag, animals, next_cursor = await run_db(
+                select_animals, age, gender, shelter_id, is_adopted, columns, after_id, limit,
+                cache_key, if_none_match, q, after_rank
+            )
+            
+        except PoolTimeout as e:
+            logger.error(f"Error in get_animals: {str(e)}")
+            raise HTTPException(status_code=503, detail=str(e))
+        except Exception as e:
+            logger.error(f"Error in get_animals: {str(e)}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+        if animals is None:
+            return not_modified(etag, next_cursor)
+        cached = (encode_animals(animals), next_cursor, etag)
+        response_cache.set(cache_key, cached, len(cached[0]), tags=(LIST_CACHE_TAG,), generation=generation)
+
+    body, next_cursor, etag = cached
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, next_cursor)
+    # Возвращаем готовый JSON, чтобы FastAPI не валидировал ответ повторно
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/api/animals/export")
+async def export_animals(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
     age: Optional[str] = None,
     gender: Optional[str] = None,
     shelter_id: Optional[int] = None,
     is_adopted: Optional[bool] = None
 ):
     """
-    Получение списка животных с возможностью фильтрации
+    Потоковая выгрузка всех животных в формате NDJSON или CSV.
+    Одновременно выполняется не больше EXPORT_MAX_CONCURRENT выгрузок, остальные получают 503.
     """
+    if not export_slots.acquire(blocking=False):
+        raise HTTPException(status_code=503, detail="Too many exports in progress",
+                            headers={"Retry-After": str(EXPORT_RETRY_AFTER)})
+    stream = release_after(stream_animals_export(format, age, gender, shelter_id, is_adopted), export_slots)
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # Базовый SQL запрос
-        query = """
-            SELECT id, name, age, gender, description, birth_date, 
-                   image_url, source_url, shelter_id, is_adopted
-            FROM animals 
-            WHERE 1=1
-        """
-        params = []
-        
-        # Добавляем фильтры
-        if age:
-            query += " AND age = %s"
-            params.append(age)
-            logger.info(f"Adding age filter: {age}")
-        if gender:
-            query += " AND gender = %s"
-            params.append(gender)
-            logger.info(f"Adding gender filter: {gender}")
-        if shelter_id:
-            query += " AND shelter_id = %s"
-            params.append(shelter_id)
-            logger.info(f"Adding shelter_id filter: {shelter_id}")
-        if is_adopted is not None:
-            query += " AND is_adopted = %s"
-            params.append(is_adopted)
-            logger.info(f"Adding is_adopted filter: {is_adopted}")
-            
-        logger.info(f"Executing query: {query}")
-        logger.info(f"With parameters: {params}")
-        
-        # Выполняем запрос
-        cur.execute(query, params)
-        animals = []
-        
-        for row in cur.fetchall():
-            logger.info(f"Raw data from DB: {row}")
-            animal = Animal(*row)
-            animal_dict = animal.to_dict()
-            logger.info(f"Processed animal data: {animal_dict}")
-            animals.append(animal_dict)
-            
-        logger.info(f"Total animals returned: {len(animals)}")
-        return animals
-        
+        # Получаем соединение и выполняем запрос до отправки ответа, чтобы ошибки вернулись статусом
+        first_chunk = await run_db(next, stream)
+    except PoolTimeout as e:
+        logger.error(f"Error in export_animals: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
-        logger.error(f"Error in get_animals: {str(e)}")
+        logger.error(f"Error in export_animals: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        cur.close()
-        conn.close()
+
+    return StreamingResponse(
+        chain([first_chunk], stream),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="animals.{format}"'}
+    )
 
 @app.get("/api/animals/{animal_id}", response_model=dict)
-async def get_animal(animal_id: int):
+async def get_animal(animal_id: int, if_none_match: Optional[str] = Header(None)):
     """
     Получение информации о конкретном животном по ID
     """
-    try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        cur.execute("""
-            SELECT id, name, age, gender, description, birth_date, 
-                   image_url, source_url, shelter_id, is_adopted
-            FROM animals 
-            WHERE id = %s
-        """, (animal_id,))
-        
-        row = cur.fetchone()
-        if not row:
+    cache_key = ("animal", animal_id)
+    cached = response_cache.get(cache_key)
+    if cached is None:
+        generation = response_cache.generation(animal_cache_tag(animal_id))
+        try:
+            result = await run_db(select_animal, animal_id)
+        except PoolTimeout as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+        if result is None:
             raise HTTPException(status_code=404, detail="Animal not found")
-            
-        animal = Animal(*row)
-        return animal.to_dict()
-        
+        animal, etag = result
+        if animal is None:
+            # Как и в списках, снятые с сайта животные не выдаются
+            raise HTTPException(status_code=410, detail="Animal is no longer listed by the shelter")
+        cached = (json.dumps(animal, default=json_default, ensure_ascii=False).encode("utf-8"), etag)
+        response_cache.set(cache_key, cached, len(cached[0]), tags=(animal_cache_tag(animal_id),),
+                           generation=generation)
+
+    body, etag = cached
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    return Response(content=body, media_type="application/json",
+                    headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+@app.get("/api/animals/{animal_id}/thumbnail")
+async def get_animal_thumbnail(animal_id: int):
+    """
+    Перенаправление на миниатюру фотографии животного по хэшу содержимого.
+    Исходное изображение загружается с сайта приюта и уменьшается только при первом запросе.
+    """
+    cache_key = ("image_url", animal_id)
+    image_url = response_cache.get(cache_key)
+    if image_url is None:
+        generation = response_cache.generation(animal_cache_tag(animal_id))
+        try:
+            image_url = await run_db(select_image_url, animal_id)
+        except PoolTimeout as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        if not image_url:
+            raise HTTPException(status_code=404, detail="Animal image not found")
+        response_cache.set(cache_key, image_url, len(image_url), tags=(animal_cache_tag(animal_id),),
+                           generation=generation)
+
+    try:
+        digest, _ = await run_in_threadpool(thumbnail_cache.get, image_url)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        cur.close()
-        conn.close()
+        logger.error(f"Error creating thumbnail for animal {animal_id}: {str(e)}")
+        raise HTTPException(status_code=502, detail="Could not fetch animal image")
+
+    return RedirectResponse(f"/api/thumbnails/{digest}.jpg", status_code=307,
+                            headers={"Cache-Control": THUMBNAIL_REDIRECT_CACHE_CONTROL})
+
+@app.get("/api/thumbnails/{digest}.jpg")
+async def get_thumbnail(digest: str = Path(..., pattern="^[0-9a-f]{64}$")):
+    """
+    Миниатюра по SHA-256 содержимого: ответ по такому URL не меняется и кэшируется клиентами навсегда
+    """
+    thumbnail = await run_in_threadpool(thumbnail_cache.read_digest, digest)
+    if thumbnail is None:
+        # Вытеснена из кэша: запрос по id животного создаст ее заново
+        raise HTTPException(status_code=404, detail="Thumbnail not found")
+    return Response(content=thumbnail, media_type=THUMBNAIL_MEDIA_TYPE,
+                    headers={"ETag": f'"{digest}"', "Cache-Control": THUMBNAIL_CACHE_CONTROL})
 
 @app.put("/api/animals/{animal_id}")
 async def update_animal(animal_id: int, animal_update: AnimalUpdate):
@@ -200,30 +626,48 @@ async def update_animal(animal_id: int, animal_update: AnimalUpdate):
     Обновление статуса усыновления животного
     """
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # Проверяем существование животного
-        cur.execute("SELECT id FROM animals WHERE id = %s", (animal_id,))
-        if not cur.fetchone():
-            raise HTTPException(status_code=404, detail="Animal not found")
-        
-        # Обновляем статус
-        cur.execute("""
-            UPDATE animals 
-            SET is_adopted = %s 
-            WHERE id = %s
-        """, (animal_update.is_adopted, animal_id))
-        
-        conn.commit()
-        return {"message": "Animal status updated successfully"}
-        
+        updated = await run_db(update_animal_status, animal_id, animal_update.is_adopted)
+    except PoolTimeout as e:
+        logger.error(f"Error updating animal status: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error updating animal status: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        cur.close()
-        conn.close()
+
+    if not updated:
+        raise HTTPException(status_code=404, detail="Animal not found")
+    # Статус влияет на карточку животного и на любые списки с фильтром is_adopted
+    response_cache.invalidate(animal_cache_tag(animal_id), LIST_CACHE_TAG)
+    return {"message": "Animal status updated successfully"}
+
+@app.post("/api/animals/bulk-status")
+async def bulk_update_animals(bulk_update: BulkStatusUpdate):
+    """
+    Пакетное обновление статуса усыновления: одна транзакция и один запрос к базе.
+    При повторе id применяется последнее значение.
+    """
+    statuses = {}
+    for update in bulk_update.updates:
+        statuses[update.id] = update.is_adopted
+    try:
+        outcomes = await run_db(update_animal_statuses, statuses)
+    except PoolTimeout as e:
+        logger.error(f"Error updating animal statuses: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error updating animal statuses: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    updated_ids = [animal_id for animal_id, outcome in outcomes.items() if outcome == "updated"]
+    if updated_ids:
+        response_cache.invalidate(LIST_CACHE_TAG, *[animal_cache_tag(animal_id) for animal_id in updated_ids])
+    results = [{"id": animal_id, "status": outcomes[animal_id]} for animal_id in statuses]
+    return {
+        "updated": len(updated_ids),
+        "unchanged": sum(1 for outcome in outcomes.values() if outcome == "unchanged"),
+        "not_found": sum(1 for outcome in outcomes.values() if outcome == "not_found"),
+        "results": results
+    }
 
 @app.get("/api/check-table")
 async def check_table():
@@ -231,23 +675,7 @@ async def check_table():
     Проверка структуры таблицы animals
     """
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # Получаем информацию о структуре таблицы
-        cur.execute("""
-            SELECT column_name, data_type 
-            FROM information_schema.columns 
-            WHERE table_name = 'animals'
-        """)
-        
-        columns = []
-        for row in cur.fetchall():
-            columns.append({
-                "name": row[0],
-                "type": row[1]
-            })
-            
+        columns = await run_db(select_table_columns)
         return {
             "status": "ok",
             "columns": columns
@@ -258,9 +686,6 @@ async def check_table():
             "status": "error",
             "error": str(e)
         }
-    finally:
-        cur.close()
-        conn.close()
 
 @app.get("/api/check-values")
 async def check_values():
@@ -268,20 +693,10 @@ async def check_values():
     Проверка уникальных значений в базе данных
     """
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # Получаем уникальные значения для каждого поля
-        cur.execute("SELECT DISTINCT gender FROM animals")
-        genders = [row[0] for row in cur.fetchall()]
-        
-        cur.execute("SELECT DISTINCT age FROM animals")
-        ages = [row[0] for row in cur.fetchall()]
-        
+        values = await run_db(select_distinct_values)
         return {
             "status": "ok",
-            "genders": genders,
-            "ages": ages
+            **values
         }
         
     except Exception as e:
@@ -289,9 +704,71 @@ async def check_values():
             "status": "error",
             "error": str(e)
         }
-    finally:
-        cur.close()
-        conn.close()
+
+@app.get("/api/facets")
+async def get_facets():
+    """
+    Значения фильтров (пол, возраст, приют, статус усыновления) с количеством животных
+    """
+    facets = response_cache.get(("facets",))
+    if facets is None:
+        generation = response_cache.generation(LIST_CACHE_TAG)
+        try:
+            facets = await run_db(select_facets)
+        except PoolTimeout as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except Exception as e:
+            logger.error(f"Error in get_facets: {str(e)}")
+            raise HTTPException(status_code=500, detail=str(e))
+        response_cache.set(("facets",), facets, len(json.dumps(facets)), tags=(LIST_CACHE_TAG,),
+                           generation=generation)
+    return facets
+
+@app.get("/api/check-pool")
+async def check_pool():
+    """
+    Метрики пула соединений с базой данных
+    """
+    return {
+        "status": "ok",
+        "pool": get_pool().stats()
+    }
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """
+    Счетчики кэша ответов (попадания, промахи, размер)
+    """
+    return {
+        "status": "ok",
+        "cache": response_cache.stats()
+    }
+
+@app.get("/api/thumbnails/stats")
+async def thumbnail_stats():
+    """
+    Размер кэша миниатюр
+    """
+    return {
+        "status": "ok",
+        "thumbnails": await run_in_threadpool(thumbnail_cache.stats)
+    }
+
+@app.post("/api/cache/invalidate")
+async def invalidate_cache(x_cache_token: Optional[str] = Header(None)):
+    """
+    Полный сброс кэша ответов (вызывается скрапером после синхронизации).
+    Требует заголовок X-Cache-Token, совпадающий с API_CACHE_INVALIDATE_TOKEN.
+    """
+    if not CACHE_INVALIDATE_TOKEN:
+        raise HTTPException(status_code=403, detail="Cache invalidation is disabled")
+    if not x_cache_token or not hmac.compare_digest(x_cache_token, CACHE_INVALIDATE_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid cache token")
+    removed = response_cache.invalidate()
+    return {
+        "status": "ok",
+        "removed": removed
+    }
 
 if __name__ == "__main__":
     import uvicorn
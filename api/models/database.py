@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Boolean, Float
+from sqlalchemy import BigInteger, Column, Integer, String, Text, ForeignKey, DateTime, Boolean, Float, Index, text
 from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from datetime import datetime, timezone
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
@@ -32,14 +33,41 @@ class Animal(Base):
     birth_date = Column(DateTime) 
     description = Column(Text)
     image_url = Column(String)
-    source_url = Column(String)
+    source_url = Column(String, unique=True, index=True)
     is_adopted = Column(Boolean, default=False)
     shelter_id = Column(Integer, ForeignKey("shelters.id"))
     created_at = Column(DateTime, default=datetime.now(timezone.utc))
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+    removed_at = Column(DateTime(timezone=True), nullable=True)  # животное исчезло с сайта приюта
+    card_fingerprint = Column(String(64))  # хэш карточки в списке приюта (имя, URL, миниатюра)
+    search_vector = Column(TSVECTOR)  # имя (вес A) и описание (вес B), словарь spanish; заполняет скрапер
 
     shelter = relationship("Shelter", back_populates="animals")
     adoption_requests = relationship("AdoptionRequest", back_populates="animal")
 
+    __table_args__ = (
+        Index("ix_animals_available", "id", postgresql_where=text("is_adopted = false AND removed_at IS NULL")),
+        Index("ix_animals_shelter_status", "shelter_id", "is_adopted", "id", postgresql_where=text("removed_at IS NULL")),
+        Index("ix_animals_gender_age", "gender", "age", "id", postgresql_where=text("removed_at IS NULL")),
+        Index("ix_animals_age", "age", postgresql_where=text("removed_at IS NULL")),
+        Index("ix_animals_search_vector", "search_vector", postgresql_using="gin"),
+    )
+
+class AnimalFacet(Base):
+    """Счетчики значений фильтров; поддерживаются триггерами на animals (см. миграции 6f1a85b2c334 и 9c4db8e5f667)"""
+    __tablename__ = "animal_facets"
+
+    facet = Column(String, primary_key=True)
+    value = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+class DataVersion(Base):
+    """Счетчики версий данных для ETag; увеличиваются триггерами при каждом изменении строк (см. миграции 8b3ca7d4e556 и a1f5c9f60778)"""
+    __tablename__ = "data_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
 class User(Base):
     __tablename__ = "users"
     
@@ -0,0 +1,117 @@
+import os
+import threading
+from collections import OrderedDict
+from time import monotonic
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+
+class ResponseCache:
+    """
+    Кэш ответов API в памяти процесса: TTL + LRU с ограничением по числу записей и байтам.
+
+    Записи помечаются тегами, по которым их можно сбросить при записи в базу.
+    Каждый воркер uvicorn держит свой кэш; сброс через API затрагивает только
+    обработавший запрос воркер, остальные догоняют по TTL.
+
+    Сброс увеличивает поколение своих тегов. Поколение снимается до чтения из базы и передается
+    в set: ответ, прочитанный до сброса, но записываемый после него, в кэш не попадает.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any, int, Tuple[str, ...]]]" = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+        self._stale_sets = 0
+        # Поколения тегов и общее поколение, которое увеличивает полная очистка
+        self._generations: Dict[str, int] = {}
+        self._cleared = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[1]
+
+    def generation(self, *tags: str) -> Tuple[int, ...]:
+        """Текущее поколение тегов; снимается до чтения из базы"""
+        with self._lock:
+            return self._generation(tags)
+
+    def _generation(self, tags: Iterable[str]) -> Tuple[int, ...]:
+        return (self._cleared, *[self._generations.get(tag, 0) for tag in tags])
+
+    def set(self, key: Hashable, value: Any, size: int, tags: Iterable[str] = (),
+            generation: Optional[Tuple[int, ...]] = None) -> None:
+        """Сохраняет запись; если с момента снятия generation теги сбрасывались, запись устарела и не сохраняется"""
+        if self.ttl <= 0 or size > self.max_bytes:
+            return
+        tags = tuple(tags)
+        with self._lock:
+            if generation is not None and generation != self._generation(tags):
+                self._stale_sets += 1
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (monotonic() + self.ttl, value, size, tags)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+
+    def invalidate(self, *tags: str) -> int:
+        """Удаляет записи с любым из тегов; без тегов очищает кэш целиком"""
+        with self._lock:
+            if tags:
+                for tag in tags:
+                    self._generations[tag] = self._generations.get(tag, 0) + 1
+                keys = [key for key, entry in self._entries.items() if set(entry[3]) & set(tags)]
+            else:
+                self._cleared += 1
+                keys = list(self._entries)
+            for key in keys:
+                self._remove(key)
+            self._invalidations += len(keys)
+            return len(keys)
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry[2]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 3) if lookups else 0.0,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+                "stale_sets": self._stale_sets
+            }
+
+
+def cache_from_env() -> ResponseCache:
+    """Создает кэш с настройками из окружения"""
+    return ResponseCache(
+        ttl=float(os.getenv('API_CACHE_TTL', '60')),
+        max_entries=int(os.getenv('API_CACHE_MAX_ENTRIES', '1024')),
+        max_bytes=int(float(os.getenv('API_CACHE_MAX_MB', '64')) * 1024 * 1024)
+    )
@@ -1,13 +1,56 @@
 import requests
-from bs4 import BeautifulSoup
-from typing import List, Dict, Any, Tuple
+from bs4 import BeautifulSoup, SoupStrainer
+from typing import List, Dict, Any, Tuple, Callable, Iterable, Iterator, Optional, TypeVar
 from abc import ABC, abstractmethod
-from time import time, sleep
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter, sleep
+import hashlib
 import logging
+import os
+
+from .throttle import AdaptiveRateLimiter, RETRY_STATUSES, backoff_delay, get_rate_limiter, parse_retry_after
+from .transport import get_session, get_connection_stats
+from .http_cache import HTTPCache, get_cache
+from .pipeline import get_parse_pool, parse_with_hash, run_pipeline
+from .checkpoint import CrawlCheckpoint
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+def default_parser() -> str:
+    """lxml, если установлен, иначе встроенный html.parser / lxml if installed, otherwise the built-in html.parser"""
+    try:
+        import lxml  # noqa: F401
+        return 'lxml'
+    except ImportError:
+        return 'html.parser'
+
 
 class BaseBeautifulSoupScraper(ABC):
-    def __init__(self, base_url: str) -> None:
+    def __init__(self, base_url: str, max_workers: Optional[int] = None,
+                 rate_limiter: Optional[AdaptiveRateLimiter] = None,
+                 cache: Optional[HTTPCache] = None, parser: Optional[str] = None,
+                 checkpoint: Optional[CrawlCheckpoint] = None, use_cache: bool = True) -> None:
         self.base_url = base_url
+        # Бэкенд BeautifulSoup / BeautifulSoup backend
+        self.parser = parser or os.getenv('SCRAPER_HTML_PARSER') or default_parser()
+        # Сколько загруженных страниц может ждать разбора / How many fetched pages may wait for parsing
+        self.pipeline_queue_size = int(os.getenv('SCRAPER_PIPELINE_QUEUE', '16'))
+        # Сколько карточек iter_animals обрабатывает за раз / How many cards iter_animals processes at a time
+        self.stream_chunk_size = max(1, int(os.getenv('SCRAPER_STREAM_CHUNK', '100')))
+        self.pipeline_stats: Dict[str, Any] = {}
+        # Кэш условных GET-запросов; use_cache=False - без кэша / Conditional GET cache; use_cache=False disables it
+        self.cache = (cache if cache is not None else get_cache()) if use_cache else None
+        # Контрольная точка обхода (задается запускающим) / Crawl checkpoint (set by the runner)
+        self.checkpoint = checkpoint
+        # Ранее сохраненные животные по source_url / Previously stored animals keyed by source_url
+        self.known_animals: Dict[str, Dict[str, Any]] = {}
+        # Параметры параллельной загрузки / Concurrent fetching settings
+        self.max_workers = max_workers or int(os.getenv('SCRAPER_MAX_WORKERS', '4'))
+        self.max_retries = max(1, int(os.getenv('SCRAPER_MAX_RETRIES', '3')))
+        # Общий для всех скраперов ограничитель скорости по хостам / Per-host rate limiter shared by all scrapers
+        self.rate_limiter = rate_limiter if rate_limiter is not None else get_rate_limiter()
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -16,7 +59,8 @@ class BaseBeautifulSoupScraper(ABC):
             'Upgrade-Insecure-Requests': '1',
             'Cache-Control': 'max-age=0'
         }
-        self.session = requests.Session()
+        # Общий пул соединений для всех скраперов / Connection pool shared by all scrapers
+        self.session = get_session()
         self.logger = logging.getLogger(self.__class__.__name__)
         self.logger.setLevel(logging.INFO)
         if not self.logger.handlers:
@@ -25,34 +69,169 @@ class BaseBeautifulSoupScraper(ABC):
             handler.setFormatter(formatter)
             self.logger.addHandler(handler)
 
+    def request(self, url: str, headers: Dict[str, str], timeout: float) -> requests.Response:
+        """
+        GET через ограничитель скорости с повторами: 429/5xx и сетевые ошибки повторяются
+        с экспоненциальной задержкой и джиттером, Retry-After соблюдается.
+        GET through the rate limiter with retries: 429/5xx and network errors are retried
+        with exponential backoff and jitter, Retry-After is honoured.
+        """
+        for attempt in range(self.max_retries):
+            last_attempt = attempt == self.max_retries - 1
+            error = None
+            with self.rate_limiter.slot(url):
+                started = perf_counter()
+                try:
+                    response = self.session.get(url, headers=headers, timeout=timeout)
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    self.rate_limiter.observe(url, None, perf_counter() - started)
+                    if last_attempt:
+                        raise
+                    error = e
+            if error is not None:
+                # Пауза вне слота, чтобы не занимать его у других потоков / Back off outside the slot so other threads can use it
+                self.logger.warning(f"Error fetching {url} (attempt {attempt + 1}/{self.max_retries}): {str(error)}")
+                sleep(backoff_delay(attempt))
+                continue
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            self.rate_limiter.observe(url, response.status_code, perf_counter() - started, retry_after)
+            if response.status_code not in RETRY_STATUSES or last_attempt:
+                return response
+            self.logger.warning(
+                f"Got {response.status_code} for {url} (attempt {attempt + 1}/{self.max_retries}), retrying"
+            )
+            # При Retry-After хост уже заблокирован ограничителем / With Retry-After the limiter already blocks the host
+            if retry_after is None:
+                sleep(backoff_delay(attempt))
+
+    def fetch(self, url: str, timeout: float = 10) -> requests.Response:
+        """Выполняет GET через кэш с условными запросами / Performs a GET through the conditional-request cache"""
+        entry = self.cache.lookup(url) if self.cache else None
+        if entry and self.cache.is_fresh(entry):
+            self.logger.info(f"Serving {url} from cache (TTL)")
+            return HTTPCache.to_response(entry)
+
+        headers = dict(self.headers)
+        if entry:
+            headers.update(HTTPCache.validators(entry))
+        response = self.request(url, headers, timeout)
+
+        if entry and response.status_code == 304:
+            self.logger.info(f"Not modified, serving {url} from cache")
+            self.cache.refresh(url)
+            return HTTPCache.to_response(entry)
+        if self.cache and response.status_code == 200:
+            self.cache.store(url, response)
+        return response
+
     def get_page(self, url: str) -> str:
         """Получает HTML-страницу / Gets HTML page"""
-        max_retries = 3
-        retry_delay = 2  # секунды / seconds
-
-        for attempt in range(max_retries):
-            try:
-                self.logger.info(f"Fetching {url} (attempt {attempt + 1}/{max_retries})")
-                response = self.session.get(url, headers=self.headers, timeout=10)
-                response.raise_for_status()
-                
-                # Добавляем небольшую задержку между запросами / Add a small delay between requests
-                sleep(retry_delay)
-                return response.text
-                
-            except requests.exceptions.RequestException as e:
-                self.logger.error(f"Error fetching {url} (attempt {attempt + 1}/{max_retries}): {str(e)}")
-                if attempt < max_retries - 1:
-                    sleep(retry_delay * (attempt + 1))  # Увеличиваем задержку с каждой попыткой / Increase delay with each attempt
-                else:
-                    self.logger.error(f"Failed to fetch {url} after {max_retries} attempts")
-                    return ""
+        try:
+            self.logger.info(f"Fetching {url}")
+            response = self.fetch(url, timeout=10)
+            response.raise_for_status()
+            return response.text
+        except requests.exceptions.RequestException as e:
+            self.logger.error(f"Failed to fetch {url} after {self.max_retries} attempts: {str(e)}")
+            return ""
+
+    def parse(self, html: str, parse_only: Optional[SoupStrainer] = None) -> BeautifulSoup:
+        """Разбирает HTML выбранным парсером; parse_only ограничивает дерево нужными блоками
+        Parses HTML with the configured parser; parse_only limits the tree to the relevant blocks"""
+        return BeautifulSoup(html, self.parser, parse_only=parse_only)
+
+    def fetch_concurrently(self, func: Callable[[T], R], items: Iterable[T]) -> List[R]:
+        """Применяет func к элементам в пуле потоков, сохраняя порядок / Applies func to items in a thread pool, preserving order"""
+        items = list(items)
+        if self.max_workers <= 1 or len(items) <= 1:
+            return [func(item) for item in items]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(func, items))
+
+    def fetch_and_parse(self, urls: List[str], parse: Callable[..., R], *parse_args: Any) -> List[Optional[R]]:
+        """
+        Загружает страницы в потоках и разбирает их в общем пуле процессов, сохраняя порядок.
+        parse(html, *parse_args) - функция уровня модуля; None для страниц, которые не удалось загрузить или разобрать.
+        С контрольной точкой уже разобранные в текущем запуске страницы не загружаются повторно.
+        Fetches pages on threads and parses them in the shared process pool, preserving order.
+        parse(html, *parse_args) is a module-level function; None for pages that failed to fetch or parse.
+        With a checkpoint, pages already parsed in the current run are not fetched again.
+        """
+        if self.checkpoint is None:
+            results, stats = run_pipeline(
+                urls, self.get_page, parse, parse_args,
+                fetch_workers=self.max_workers, queue_size=self.pipeline_queue_size, pool=get_parse_pool()
+            )
+            self._add_pipeline_stats(stats)
+            return results
+
+        done = self.checkpoint.completed(urls)
+        pending = [url for url in urls if url not in done]
+        if done:
+            self.logger.info(f"Checkpoint: {len(done)} of {len(urls)} pages already done in this run")
+        hashed, stats = run_pipeline(
+            pending, self.get_page, parse_with_hash, (parse, *parse_args),
+            fetch_workers=self.max_workers, queue_size=self.pipeline_queue_size, pool=get_parse_pool()
+        )
+        stats['resumed'] = len(done)
+        self._add_pipeline_stats(stats)
+        for url, item in zip(pending, hashed):
+            if item is None:
+                self.checkpoint.record_failure(url, "fetch or parse failed")
+            else:
+                content_hash, done[url] = item
+                self.checkpoint.record(url, content_hash, done[url])
+        return [done.get(url) for url in urls]
+
+    def _add_pipeline_stats(self, stats: Dict[str, Any]) -> None:
+        """Статистика суммируется по всем вызовам / Stats are accumulated across calls"""
+        for key, value in stats.items():
+            if key == 'queue_peak':
+                self.pipeline_stats[key] = max(self.pipeline_stats.get(key, 0), value)
+            else:
+                self.pipeline_stats[key] = self.pipeline_stats.get(key, 0) + value
+
+    @staticmethod
+    def card_fingerprint(basic_info: Dict[str, Any]) -> str:
+        """Отпечаток карточки из списка: имя, URL, миниатюра / Listing card fingerprint: name, URL, thumbnail"""
+        parts = [basic_info.get(key) or '' for key in ('name', 'source_url', 'image_url')]
+        return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+    def stored_details(self, basic_info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Сохраненные детали, если карточка не изменилась / Stored details if the card is unchanged"""
+        known = self.known_animals.get(basic_info['source_url'])
+        if not known or known.get('card_fingerprint') != basic_info['card_fingerprint']:
+            return None
+        if not known.get('description'):
+            return None  # прошлая загрузка деталей, вероятно, не удалась / previous detail fetch likely failed
+        return {key: value for key, value in known.items() if key != 'card_fingerprint'}
+
+    def fallback_details(self, basic_info: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Детали карточки, детальная страница которой не загрузилась: сохраненные, если есть, с пометкой
+        details_missing, чтобы синхронизация не затерла детали и отпечаток в базе.
+        Details of a card whose detail page failed: the stored ones, if any, marked details_missing
+        so that syncing does not overwrite the details and fingerprint in the database.
+        """
+        known = self.known_animals.get(basic_info['source_url']) or {}
+        details = {key: value for key, value in known.items() if key != 'card_fingerprint'}
+        details['details_missing'] = True
+        return details
 
     @abstractmethod
     def extract_animals(self) -> List[Dict[str, Any]]:
         """Извлекает информацию о животных / Extracts information about animals"""
         pass
 
+    def iter_animals(self) -> Iterator[Dict[str, Any]]:
+        """
+        Выдает животных по мере извлечения; ошибки пробрасываются, чтобы вызывающий мог сохранить
+        уже полученное. По умолчанию - extract_animals целиком, скраперы могут переопределить.
+        Yields animals as they are extracted; errors are raised so the caller can keep what it
+        already has. Defaults to the whole extract_animals list, scrapers may override it.
+        """
+        yield from self.extract_animals()
+
     def extract_shelter_info(self) -> Dict[str, str]:
         """Извлекает информацию о приюте / Extracts shelter information"""
         return {
@@ -62,8 +241,30 @@ class BaseBeautifulSoupScraper(ABC):
             "website": self.base_url
         }
 
+    def log_connection_stats(self) -> None:
+        """Логирует статистику соединений и скорости / Logs connection reuse and rate statistics"""
+        for host, stats in get_connection_stats().items():
+            self.logger.info(
+                f"Connection stats for {host}: {stats['requests']} requests, "
+                f"{stats['connections']} new connections, {stats['reused']} reused "
+                f"(reuse ratio {stats['reuse_ratio']})"
+            )
+        for host, stats in self.rate_limiter.stats().items():
+            self.logger.info(
+                f"Rate limiter for {host}: {stats['rate']} req/s, "
+                f"{stats['requests']} requests, {stats['throttled']} throttled (429/503)"
+            )
+        if self.pipeline_stats:
+            stats = self.pipeline_stats
+            self.logger.info(
+                f"Pipeline: {stats['fetched']}/{stats['pages']} pages fetched, {stats['parsed']} parsed "
+                f"in {stats['parse_seconds']:.2f}s of parse time, queue peak {stats['queue_peak']}"
+                + (f", {stats['resumed']} from checkpoint" if stats.get('resumed') else "")
+            )
+
     def run(self) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
         """Запускает скрапер и возвращает извлеченные данные / Runs scraper and returns extracted data"""
         animals = self.extract_animals()
         shelter_info = self.extract_shelter_info()
+        self.log_connection_stats()
         return animals, shelter_info 
\ No newline at end of file
@@ -0,0 +1,151 @@
+import os
+import pickle
+import sqlite3
+import threading
+from time import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+DEFAULT_CHECKPOINT_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.cache', 'crawl_checkpoints.sqlite'
+)
+
+
+class CrawlCheckpoint:
+    """Контрольные точки обхода одного скрапера / Crawl checkpoints of a single scraper
+
+    Для каждого запуска хранит в SQLite статус загрузки каждой страницы, SHA-256 ее HTML и
+    результат разбора. Незавершенный запуск (процесс упал до finish) продолжается следующим:
+    уже разобранные страницы берутся из контрольной точки, загружаются только оставшиеся.
+    Stores per-page fetch status, the SHA-256 of its HTML and the parse result for each run
+    in SQLite. An unfinished run (the process died before finish) is resumed by the next one:
+    pages already parsed come from the checkpoint, only the remaining ones are fetched.
+
+    max_age - через сколько секунд незавершенный запуск не продолжается, а начинается заново
+    max_age - seconds after which an unfinished run is started over instead of resumed
+    """
+
+    def __init__(self, scraper: str, path: str = DEFAULT_CHECKPOINT_PATH, max_age: float = 24 * 3600) -> None:
+        self.scraper = scraper
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Файл общий для приютов, которые скрапятся параллельно / The file is shared by shelters scraped in parallel
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS crawl_runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                scraper TEXT NOT NULL,
+                started_at REAL NOT NULL,
+                finished_at REAL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS crawl_pages (
+                run_id INTEGER NOT NULL REFERENCES crawl_runs (id),
+                url TEXT NOT NULL,
+                status TEXT NOT NULL,
+                content_hash TEXT,
+                result BLOB,
+                error TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (run_id, url)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_crawl_runs_scraper ON crawl_runs (scraper, finished_at)")
+        self._conn.commit()
+        self.run_id, self.resumed = self._start_run()
+
+    def _start_run(self) -> Tuple[int, bool]:
+        """Продолжает незавершенный запуск скрапера или начинает новый / Resumes an unfinished run or starts a new one"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, started_at FROM crawl_runs WHERE scraper = ? AND finished_at IS NULL "
+                "ORDER BY id DESC LIMIT 1",
+                (self.scraper,)
+            ).fetchone()
+            if row and time() - row[1] < self.max_age:
+                return row[0], True
+            # Устаревшие незавершенные запуски закрываются / Stale unfinished runs are closed
+            self._conn.execute(
+                "DELETE FROM crawl_pages WHERE run_id IN "
+                "(SELECT id FROM crawl_runs WHERE scraper = ? AND finished_at IS NULL)", (self.scraper,)
+            )
+            self._conn.execute(
+                "UPDATE crawl_runs SET finished_at = ? WHERE scraper = ? AND finished_at IS NULL", (time(), self.scraper)
+            )
+            cursor = self._conn.execute(
+                "INSERT INTO crawl_runs (scraper, started_at) VALUES (?, ?)", (self.scraper, time())
+            )
+            self._conn.commit()
+            return cursor.lastrowid, False
+
+    def completed(self, urls: Iterable[str]) -> Dict[str, Any]:
+        """Результаты уже разобранных в этом запуске страниц / Parse results of pages already done in this run"""
+        urls = list(urls)
+        found = {}
+        with self._lock:
+            # Пачками, чтобы не упереться в лимит параметров SQLite / In chunks to stay under SQLite's parameter limit
+            for start in range(0, len(urls), 500):
+                chunk = urls[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT url, result FROM crawl_pages WHERE run_id = ? AND status = 'done' "
+                    f"AND url IN ({', '.join('?' * len(chunk))})",
+                    (self.run_id, *chunk)
+                ).fetchall()
+                found.update((url, pickle.loads(result)) for url, result in rows)
+        return found
+
+    def record(self, url: str, content_hash: str, result: Any) -> None:
+        """Отмечает страницу разобранной / Marks a page as done"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO crawl_pages (run_id, url, status, content_hash, result, error, updated_at) "
+                "VALUES (?, ?, 'done', ?, ?, NULL, ?)",
+                (self.run_id, url, content_hash, pickle.dumps(result), time())
+            )
+            self._conn.commit()
+
+    def record_failure(self, url: str, error: str) -> None:
+        """Отмечает неудачную страницу; она будет загружена снова / Marks a failed page; it will be fetched again"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO crawl_pages (run_id, url, status, content_hash, result, error, updated_at) "
+                "VALUES (?, ?, 'failed', NULL, NULL, ?, ?)",
+                (self.run_id, url, error, time())
+            )
+            self._conn.commit()
+
+    def finish(self) -> None:
+        """Завершает запуск и удаляет его страницы / Finishes the run and drops its pages"""
+        with self._lock:
+            self._conn.execute("DELETE FROM crawl_pages WHERE run_id = ?", (self.run_id,))
+            self._conn.execute("UPDATE crawl_runs SET finished_at = ? WHERE id = ?", (time(), self.run_id))
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM crawl_pages WHERE run_id = ? GROUP BY status", (self.run_id,)
+            ).fetchall()
+        counts = {'done': 0, 'failed': 0}
+        counts.update(rows)
+        return counts
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def checkpoint_from_env(scraper: str) -> Optional[CrawlCheckpoint]:
+    """Контрольная точка скрапера, если они включены / Scraper checkpoint, if enabled"""
+    if os.getenv('SCRAPER_CHECKPOINTS_ENABLED', '1') != '1':
+        return None
+    return CrawlCheckpoint(
+        scraper,
+        path=os.getenv('SCRAPER_CHECKPOINT_PATH', DEFAULT_CHECKPOINT_PATH),
+        max_age=float(os.getenv('SCRAPER_CHECKPOINT_MAX_AGE_HOURS', '24')) * 3600
+    )
@@ -0,0 +1,154 @@
+import json
+import os
+import sqlite3
+import threading
+from time import time
+from typing import Any, Dict, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.cache', 'http_cache.sqlite'
+)
+
+# Заголовки, которые теряют смысл после распаковки тела / Headers that no longer apply to the decoded body
+_DROPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection'}
+
+
+class HTTPCache:
+    """Постоянный кэш ответов для условных GET-запросов / Persistent response cache for conditional GETs
+
+    Хранит тело ответа вместе с ETag/Last-Modified в SQLite, вытесняет
+    давно не использованные записи при превышении max_bytes.
+    Stores response bodies with their ETag/Last-Modified in SQLite and evicts
+    least recently used entries once max_bytes is exceeded.
+
+    ttl - сколько секунд ответ считается свежим без перепроверки (0 - всегда перепроверять)
+    ttl - seconds a response is served without revalidation (0 - always revalidate)
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = 200 * 1024 * 1024, ttl: float = 0) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_responses_accessed_at ON responses (accessed_at)")
+        self._conn.commit()
+
+    def lookup(self, url: str) -> Optional[Dict[str, Any]]:
+        """Возвращает запись кэша и отмечает её использование / Returns a cache entry and marks it as used"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, headers, body, stored_at FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+            if not row:
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE url = ?", (time(), url))
+            self._conn.commit()
+        return {
+            'url': url,
+            'etag': row[0],
+            'last_modified': row[1],
+            'headers': json.loads(row[2]),
+            'body': row[3],
+            'stored_at': row[4]
+        }
+
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        return self.ttl > 0 and time() - entry['stored_at'] < self.ttl
+
+    @staticmethod
+    def validators(entry: Dict[str, Any]) -> Dict[str, str]:
+        """Заголовки условного запроса / Conditional request headers"""
+        headers = {}
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store(self, url: str, response: requests.Response) -> None:
+        """Сохраняет успешный ответ / Stores a successful response"""
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not (etag or last_modified or self.ttl > 0):
+            return  # ответ нельзя перепроверить / response cannot be revalidated
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in _DROPPED_HEADERS}
+        body = response.content
+        now = time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (url, etag, last_modified, headers, body, size, stored_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, json.dumps(headers), body, len(body), now, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def refresh(self, url: str) -> None:
+        """Продлевает запись после ответа 304 / Renews an entry after a 304 response"""
+        with self._lock:
+            self._conn.execute("UPDATE responses SET stored_at = ? WHERE url = ?", (time(), url))
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Удаляет давно не использованные записи сверх лимита / Drops least recently used entries over the limit"""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        victims = []
+        for url, size in self._conn.execute("SELECT url, size FROM responses ORDER BY accessed_at"):
+            if total <= self.max_bytes:
+                break
+            victims.append((url,))
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE url = ?", victims)
+
+    @staticmethod
+    def to_response(entry: Dict[str, Any]) -> requests.Response:
+        """Собирает requests.Response из записи кэша / Builds a requests.Response from a cache entry"""
+        response = requests.Response()
+        response.status_code = 200
+        response.url = entry['url']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response._content = entry['body']
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.from_cache = True
+        return response
+
+
+_lock = threading.Lock()
+_cache: Optional[HTTPCache] = None
+
+
+def get_cache() -> Optional[HTTPCache]:
+    """Общий кэш скраперов, если он включён / Cache shared by all scrapers, if enabled"""
+    global _cache
+    if os.getenv('SCRAPER_CACHE_ENABLED', '1') != '1':
+        return None
+    with _lock:
+        if _cache is None:
+            _cache = HTTPCache(
+                path=os.getenv('SCRAPER_CACHE_PATH', DEFAULT_CACHE_PATH),
+                max_bytes=int(float(os.getenv('SCRAPER_CACHE_MAX_MB', '200')) * 1024 * 1024),
+                ttl=float(os.getenv('SCRAPER_CACHE_TTL', '0'))
+            )
+        return _cache
@@ -0,0 +1,198 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def timed_call(func: Callable[..., Any], *args: Any) -> Tuple[Any, float]:
+    """Выполняется в процессе разбора: результат и время / Runs in the parse process: result and elapsed time"""
+    started = perf_counter()
+    result = func(*args)
+    return result, perf_counter() - started
+
+
+def parse_with_hash(html: str, parse: Callable[..., Any], *args: Any) -> Tuple[str, Any]:
+    """SHA-256 HTML и результат parse(html, *args) - для контрольных точек / HTML SHA-256 and parse result - for checkpoints"""
+    return hashlib.sha256(html.encode('utf-8')).hexdigest(), parse(html, *args)
+
+
+def run_pipeline(urls: Sequence[str], fetch: Callable[[str], Optional[str]], parse: Callable[..., Any],
+                 parse_args: Tuple[Any, ...] = (), fetch_workers: int = 4, queue_size: int = 16,
+                 pool: Optional[Executor] = None) -> Tuple[List[Any], Dict[str, Any]]:
+    """
+    Конвейер загрузка -> разбор / Fetch -> parse pipeline.
+
+    Потоки загрузки кладут HTML в ограниченную очередь, диспетчер отправляет страницы в пул
+    процессов разбора. Не более queue_size страниц ждут в очереди и не более queue_size
+    разбираются одновременно: при медленном разборе загрузчики блокируются на put(), так что
+    память не растет с числом страниц.
+    Fetcher threads put HTML into a bounded queue and a dispatcher submits pages to the parse
+    process pool. At most queue_size pages wait in the queue and at most queue_size are being
+    parsed, so slow parsing blocks fetchers on put() and memory stays bounded.
+
+    parse должна быть функцией уровня модуля (передается в другой процесс); без пула разбор
+    выполняется в потоке диспетчера. Результат - в порядке urls, None для неудачных страниц.
+    parse must be a module-level function (it is sent to another process); without a pool
+    parsing runs on the dispatcher thread. Results follow urls order, None for failed pages.
+
+    Если пул сломался (BrokenProcessPool), он сбрасывается, а оставшиеся страницы разбираются
+    в потоке диспетчера; HTML отправленных в пул страниц хранится до получения результата, так что
+    страницы, разбор которых прервался вместе с пулом, тоже разбираются заново в потоке диспетчера.
+    If the pool breaks (BrokenProcessPool), it is discarded and the remaining pages are parsed on
+    the dispatcher thread; the HTML of pages sent to the pool is kept until their result arrives,
+    so pages lost together with the pool are parsed again on the dispatcher thread as well.
+    """
+    results: List[Any] = [None] * len(urls)
+    stats = {'pages': len(urls), 'fetched': 0, 'parsed': 0, 'parse_seconds': 0.0, 'queue_peak': 0}
+    if not urls:
+        return results, stats
+
+    pages: "queue.Queue[Tuple[int, Optional[str]]]" = queue.Queue(maxsize=max(1, queue_size))
+    in_flight = threading.BoundedSemaphore(max(1, queue_size))
+    lock = threading.Lock()
+    next_index = iter(range(len(urls)))
+    # HTML страниц в пуле до получения результата и страницы, потерянные вместе с пулом
+    # HTML of pages in the pool until their result arrives, and pages lost together with the pool
+    submitted: Dict[int, str] = {}
+    lost: List[int] = []
+
+    def fetcher() -> None:
+        while True:
+            with lock:
+                index = next(next_index, None)
+            if index is None:
+                return
+            html = None
+            try:
+                html = fetch(urls[index])
+            except Exception as e:
+                logger.error(f"Error fetching {urls[index]}: {str(e)}")
+            finally:
+                pages.put((index, html))
+                with lock:
+                    if html:
+                        stats['fetched'] += 1
+                    stats['queue_peak'] = max(stats['queue_peak'], pages.qsize())
+
+    def collect(index: int, future: Future, source: Optional[Executor] = None) -> None:
+        try:
+            result, elapsed = future.result()
+            with lock:
+                results[index] = result
+                stats['parsed'] += 1
+                stats['parse_seconds'] += elapsed
+                submitted.pop(index, None)
+        except BrokenProcessPool as e:
+            logger.error(f"Parse pool broke while parsing {urls[index]}, it will be parsed inline: {str(e)}")
+            with lock:
+                lost.append(index)
+            discard_parse_pool(source)
+        except Exception as e:
+            logger.error(f"Error parsing {urls[index]}: {str(e)}")
+            with lock:
+                submitted.pop(index, None)
+        finally:
+            in_flight.release()
+
+    def parse_inline(index: int, html: str) -> None:
+        future = Future()
+        try:
+            future.set_result(timed_call(parse, html, *parse_args))
+        except Exception as e:
+            future.set_exception(e)
+        collect(index, future)
+
+    threads = [threading.Thread(target=fetcher, daemon=True) for _ in range(max(1, min(fetch_workers, len(urls))))]
+    for thread in threads:
+        thread.start()
+
+    for _ in range(len(urls)):
+        index, html = pages.get()
+        if not html:
+            continue
+        in_flight.acquire()
+        if pool is not None:
+            with lock:
+                submitted[index] = html
+            try:
+                future = pool.submit(timed_call, parse, html, *parse_args)
+            except Exception as e:
+                # Разрешение остается за этой страницей: ее разберет диспетчер, collect его освободит
+                # The permit stays with this page: the dispatcher parses it and collect releases it
+                logger.error(f"Parse pool failed, parsing the remaining pages inline: {str(e)}")
+                with lock:
+                    submitted.pop(index, None)
+                discard_parse_pool(pool)
+                pool = None
+            else:
+                future.add_done_callback(lambda done, index=index, source=pool: collect(index, done, source))
+                continue
+
+        parse_inline(index, html)
+
+    for thread in threads:
+        thread.join()
+    # Все разрешения вернулись - значит, все collect отработали (колбэки future выполняются уже
+    # после того, как future.result() вернулся). All permits are back, so every collect has run
+    # (future callbacks run after future.result() has already returned)
+    for _ in range(max(1, queue_size)):
+        in_flight.acquire()
+    for _ in range(max(1, queue_size)):
+        in_flight.release()
+
+    # Страницы, разбор которых прервался вместе с пулом / Pages whose parsing died with the pool
+    for index in sorted(lost):
+        in_flight.acquire()
+        parse_inline(index, submitted.pop(index))
+    return results, stats
+
+
+_lock = threading.Lock()
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_parse_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Общий пул процессов разбора HTML (SCRAPER_PARSE_WORKERS, по умолчанию число ядер; 0 - без пула).
+    Shared HTML parse process pool (SCRAPER_PARSE_WORKERS, defaults to the CPU count; 0 - no pool).
+    """
+    global _pool
+    workers = int(os.getenv('SCRAPER_PARSE_WORKERS', str(os.cpu_count() or 1)))
+    if workers <= 0:
+        return None
+    with _lock:
+        if _pool is None:
+            # spawn: процесс скрапера многопоточный, fork мог бы унаследовать захваченные блокировки
+            # spawn: the scraper process is multi-threaded, fork could inherit held locks
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            logger.info(f"Parse pool started with {workers} processes")
+        return _pool
+
+
+def discard_parse_pool(pool: Optional[Executor]) -> None:
+    """
+    Сбрасывает сломанный пул, чтобы следующий вызов get_parse_pool создал новый.
+    Discards a broken pool so the next get_parse_pool call starts a fresh one.
+    """
+    global _pool
+    with _lock:
+        if pool is None or pool is not _pool:
+            return
+        _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_parse_pool() -> None:
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
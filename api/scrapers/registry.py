@@ -0,0 +1,66 @@
+import importlib
+import inspect
+import logging
+import pkgutil
+from importlib.metadata import entry_points
+from typing import Dict, Type
+
+from . import web
+from .base_beautifulsoup_scraper import BaseBeautifulSoupScraper
+
+logger = logging.getLogger(__name__)
+
+# Группа entry points для скраперов из внешних пакетов / Entry point group for scrapers from external packages
+ENTRY_POINT_GROUP = "scrapy4paws.scrapers"
+
+
+def _is_scraper(obj) -> bool:
+    return (
+        inspect.isclass(obj)
+        and issubclass(obj, BaseBeautifulSoupScraper)
+        and obj is not BaseBeautifulSoupScraper
+        and not inspect.isabstract(obj)
+    )
+
+
+def scan_modules() -> Dict[str, Type[BaseBeautifulSoupScraper]]:
+    """Скраперы, объявленные в модулях scrapers/web / Scrapers declared in scrapers/web modules"""
+    found = {}
+    for module_info in pkgutil.iter_modules(web.__path__, web.__name__ + "."):
+        try:
+            module = importlib.import_module(module_info.name)
+        except Exception as e:
+            # Сломанный модуль не должен мешать остальным приютам / A broken module must not block other shelters
+            logger.error(f"Could not import scraper module {module_info.name}: {str(e)}")
+            continue
+        for _, obj in inspect.getmembers(module, _is_scraper):
+            if obj.__module__ == module.__name__:
+                found[obj.__name__] = obj
+    return found
+
+
+def load_entry_points() -> Dict[str, Type[BaseBeautifulSoupScraper]]:
+    """Скраперы, зарегистрированные через entry points / Scrapers registered via entry points"""
+    found = {}
+    for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+        try:
+            obj = entry_point.load()
+        except Exception as e:
+            logger.error(f"Could not load scraper entry point {entry_point.name}: {str(e)}")
+            continue
+        if not _is_scraper(obj):
+            logger.error(f"Entry point {entry_point.name} is not a BaseBeautifulSoupScraper subclass")
+            continue
+        found[entry_point.name] = obj
+    return found
+
+
+def discover_scrapers() -> Dict[str, Type[BaseBeautifulSoupScraper]]:
+    """
+    Все доступные скраперы по имени: модули scrapers/web и entry points.
+    All available scrapers by name: scrapers/web modules and entry points.
+    Entry point с тем же именем заменяет встроенный скрапер / An entry point with the same name overrides a built-in scraper.
+    """
+    scrapers = scan_modules()
+    scrapers.update(load_entry_points())
+    return dict(sorted(scrapers.items()))
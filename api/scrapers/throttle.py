@@ -0,0 +1,171 @@
+import logging
+import os
+import random
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from time import monotonic, sleep
+from typing import Any, Dict, Iterator, Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Ответы, после которых сервер просит снизить нагрузку / Responses asking the client to back off
+THROTTLE_STATUSES = frozenset({429, 503})
+# Ответы, которые имеет смысл повторить / Responses worth retrying
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After в секундах (число или HTTP-дата) / Retry-After in seconds (number or HTTP date)"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """Экспоненциальная задержка с полным джиттером / Exponential backoff with full jitter"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class _HostBucket:
+    def __init__(self, rate: float, burst: float, max_concurrent: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = monotonic()
+        self.blocked_until = 0.0
+        self.slots = threading.Semaphore(max_concurrent)
+        self.requests = 0
+        self.throttled = 0
+
+
+class AdaptiveRateLimiter:
+    """Адаптивный token bucket для каждого хоста / Adaptive per-host token bucket
+
+    Каждый хост получает `rate` запросов в секунду (с запасом `burst`) и не более
+    `max_concurrent` одновременных запросов. Быстрые успешные ответы постепенно
+    повышают скорость (аддитивно, до `max_rate`), медленные ответы и 429/503 снижают
+    ее мультипликативно (до `min_rate`); Retry-After блокирует хост на указанное время,
+    но не дольше `max_retry_after` секунд.
+    Each host gets `rate` requests per second (with `burst` headroom) and at most
+    `max_concurrent` requests in flight. Fast successful responses raise the rate
+    additively up to `max_rate`; slow responses and 429/503 cut it multiplicatively
+    down to `min_rate`; Retry-After blocks the host for the given time, but no longer
+    than `max_retry_after` seconds.
+    """
+
+    def __init__(self, rate: float = 4.0, min_rate: float = 0.2, max_rate: float = 20.0,
+                 max_concurrent: int = 2, burst: float = 2.0, increase: float = 0.5,
+                 decrease: float = 0.5, slow_response: float = 2.0, max_retry_after: float = 300.0) -> None:
+        self.min_rate = max(0.01, min_rate)
+        self.max_rate = max(self.min_rate, max_rate)
+        self.rate = min(self.max_rate, max(self.min_rate, rate))
+        self.max_concurrent = max(1, max_concurrent)
+        self.burst = max(1.0, burst)
+        self.increase = increase
+        self.decrease = decrease
+        self.slow_response = slow_response
+        self.max_retry_after = max(0.0, max_retry_after)
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, _HostBucket] = {}
+
+    def _bucket(self, host: str) -> _HostBucket:
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = _HostBucket(self.rate, self.burst, self.max_concurrent)
+            return self._hosts[host]
+
+    def _take_token(self, bucket: _HostBucket) -> None:
+        """Ждет токен с учетом Retry-After / Waits for a token, honouring Retry-After"""
+        while True:
+            with self._lock:
+                now = monotonic()
+                bucket.tokens = min(bucket.burst, bucket.tokens + (now - bucket.updated) * bucket.rate)
+                bucket.updated = now
+                if now < bucket.blocked_until:
+                    wait = bucket.blocked_until - now
+                elif bucket.tokens >= 1:
+                    bucket.tokens -= 1
+                    bucket.requests += 1
+                    return
+                else:
+                    wait = (1 - bucket.tokens) / bucket.rate
+            sleep(wait)
+
+    @contextmanager
+    def slot(self, url: str) -> Iterator[None]:
+        """Удерживает слот хоста на время запроса / Holds a host slot for the duration of a request"""
+        bucket = self._bucket(urlparse(url).netloc)
+        with bucket.slots:
+            self._take_token(bucket)
+            yield
+
+    def observe(self, url: str, status: Optional[int], elapsed: float,
+                retry_after: Optional[float] = None) -> None:
+        """
+        Подстраивает скорость по результату запроса (status=None - сетевая ошибка).
+        Adjusts the rate from a request outcome (status=None means a network error).
+        """
+        bucket = self._bucket(urlparse(url).netloc)
+        with self._lock:
+            if status is None or status in THROTTLE_STATUSES or status >= 500:
+                bucket.rate = max(self.min_rate, bucket.rate * self.decrease)
+                bucket.tokens = min(bucket.tokens, 0.0)
+                if status in THROTTLE_STATUSES:
+                    bucket.throttled += 1
+                if retry_after and retry_after > self.max_retry_after:
+                    # Ошибочный или враждебный Retry-After не должен останавливать скрапер на часы
+                    # A bogus or hostile Retry-After must not stall the scraper for hours
+                    logger.warning(f"Retry-After {retry_after:.0f}s from {urlparse(url).netloc} "
+                                   f"clamped to {self.max_retry_after:.0f}s")
+                    retry_after = self.max_retry_after
+                if retry_after:
+                    bucket.blocked_until = max(bucket.blocked_until, monotonic() + retry_after)
+            elif elapsed > self.slow_response:
+                bucket.rate = max(self.min_rate, bucket.rate * (1 - (1 - self.decrease) / 2))
+            elif status < 400:
+                bucket.rate = min(self.max_rate, bucket.rate + self.increase)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Текущая скорость и счетчики по хостам / Current rate and counters per host"""
+        with self._lock:
+            return {
+                host: {
+                    'rate': round(bucket.rate, 2),
+                    'requests': bucket.requests,
+                    'throttled': bucket.throttled
+                }
+                for host, bucket in self._hosts.items()
+            }
+
+
+_lock = threading.Lock()
+_limiter: Optional[AdaptiveRateLimiter] = None
+
+
+def get_rate_limiter() -> AdaptiveRateLimiter:
+    """Общий для всех скраперов процесса ограничитель / Rate limiter shared by all scrapers in the process"""
+    global _limiter
+    with _lock:
+        if _limiter is None:
+            _limiter = AdaptiveRateLimiter(
+                rate=float(os.getenv('SCRAPER_RATE', '4')),
+                min_rate=float(os.getenv('SCRAPER_MIN_RATE', '0.2')),
+                max_rate=float(os.getenv('SCRAPER_MAX_RATE', '20')),
+                max_concurrent=int(os.getenv('SCRAPER_PER_HOST_LIMIT', '2')),
+                max_retry_after=float(os.getenv('SCRAPER_MAX_RETRY_AFTER', '300'))
+            )
+        return _limiter
@@ -0,0 +1,109 @@
+import os
+import threading
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+def _accept_encoding() -> str:
+    """Список поддерживаемых алгоритмов сжатия / Supported compression algorithms"""
+    try:
+        import brotli  # noqa: F401  urllib3 декодирует br, только если brotli установлен
+        return 'gzip, deflate, br'
+    except ImportError:
+        return 'gzip, deflate'
+
+
+class ConnectionStats:
+    """Статистика повторного использования соединений / Connection reuse statistics
+
+    urllib3 ведёт счётчики num_requests и num_connections для каждого пула хоста;
+    мы запоминаем последние значения, чтобы они не терялись при вытеснении пула.
+    urllib3 keeps num_requests and num_connections per host pool; the latest
+    values are remembered so they survive pool eviction.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pools: Dict[int, Dict[str, Any]] = {}
+
+    def observe(self, host: str, pool: Any) -> None:
+        with self._lock:
+            self._pools[id(pool)] = {
+                'pool': pool,
+                'host': host,
+                'requests': pool.num_requests,
+                'connections': pool.num_connections
+            }
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Возвращает статистику по хостам / Returns per-host statistics"""
+        result: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            for entry in self._pools.values():
+                host_stats = result.setdefault(entry['host'], {'requests': 0, 'connections': 0})
+                host_stats['requests'] += entry['requests']
+                host_stats['connections'] += entry['connections']
+        for host_stats in result.values():
+            reused = max(0, host_stats['requests'] - host_stats['connections'])
+            host_stats['reused'] = reused
+            host_stats['reuse_ratio'] = round(reused / host_stats['requests'], 3) if host_stats['requests'] else 0.0
+        return result
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter, собирающий статистику соединений / HTTPAdapter that records connection statistics"""
+
+    def __init__(self, stats: ConnectionStats, **kwargs) -> None:
+        self.stats = stats
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        pool = self.get_connection(request.url, kwargs.get('proxies'))
+        self.stats.observe(urlparse(request.url).netloc, pool)
+        return response
+
+
+_lock = threading.Lock()
+_session: Optional[requests.Session] = None
+_stats = ConnectionStats()
+
+
+def create_session(pool_connections: Optional[int] = None, pool_maxsize: Optional[int] = None,
+                   pool_block: bool = False, stats: Optional[ConnectionStats] = None) -> requests.Session:
+    """Создаёт сессию с пулом keep-alive соединений / Creates a session with a keep-alive connection pool
+
+    pool_connections - сколько пулов хостов хранить / how many host pools to keep
+    pool_maxsize - сколько соединений держать на один хост / connections kept per host
+    """
+    adapter = PooledHTTPAdapter(
+        stats if stats is not None else _stats,
+        pool_connections=pool_connections or int(os.getenv('SCRAPER_POOL_CONNECTIONS', '10')),
+        pool_maxsize=pool_maxsize or int(os.getenv('SCRAPER_POOL_MAXSIZE', '10')),
+        pool_block=pool_block
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({
+        'Accept-Encoding': _accept_encoding(),
+        'Connection': 'keep-alive'
+    })
+    return session
+
+
+def get_session() -> requests.Session:
+    """Общая для всех скраперов сессия / Session shared by all scrapers"""
+    global _session
+    with _lock:
+        if _session is None:
+            _session = create_session()
+        return _session
+
+
+def get_connection_stats() -> Dict[str, Dict[str, Any]]:
+    """Статистика общей сессии / Statistics of the shared session"""
+    return _stats.snapshot()
@@ -1,17 +1,95 @@
-from bs4 import BeautifulSoup
-from typing import List, Dict, Any, Optional
+from bs4 import BeautifulSoup, SoupStrainer
+from typing import List, Dict, Any, Iterator, Optional
 from ..base_beautifulsoup_scraper import BaseBeautifulSoupScraper
-from time import sleep
 import requests
 from datetime import datetime
 import re
 
+def _has_class(*names: str):
+    """Фильтр SoupStrainer по CSS-классу: при разборе class еще не разбит на список
+    SoupStrainer filter by CSS class: while parsing, class is still a single string"""
+    wanted = set(names)
+    return lambda value: bool(value) and not wanted.isdisjoint(value.split() if isinstance(value, str) else value)
+
+
+# Разбираются только нужные блоки страниц / Only the relevant page blocks are parsed
+LISTING_STRAINER = SoupStrainer('li', class_=_has_class('product'))
+DETAIL_STRAINER = SoupStrainer(class_=_has_class('elementor-widget-theme-post-excerpt', 'elementor-widget-text-editor'))
+BIRTH_DATE_RE = re.compile(r'(\d{2}/\d{2}/\d{4})')
+
+
+def parse_birth_date(date_str: str) -> Optional[datetime]:
+    """Конвертирует строковую дату DD/MM/YYYY в объект datetime"""
+    try:
+        return datetime.strptime(date_str, "%d/%m/%Y")
+    except ValueError:
+        return None
+
+
+def parse_detail_page(html: str, parser: str) -> Dict[str, Any]:
+    """
+    Parse a cat's detail page / Разбор детальной страницы кота.
+    Module-level so it can run in the parse process pool / На уровне модуля, чтобы выполняться в пуле процессов разбора.
+    """
+    soup = BeautifulSoup(html, parser, parse_only=DETAIL_STRAINER)
+
+    # Extract description
+    description_element = soup.select_one('.elementor-widget-theme-post-excerpt .elementor-widget-container')
+    description = description_element.get_text(strip=True) if description_element else ""
+
+    # Sex, birth date and age in one pass over the text blocks (the first block with each label wins)
+    # Пол, дата рождения и возраст за один проход по текстовым блокам
+    gender = "unknown"
+    birth_date = None
+    age = "unknown"
+    gender_found = birth_date_found = age_found = False
+    for block in soup.find_all(class_='elementor-widget-text-editor'):
+        text = block.get_text(strip=True)
+        lower_text = text.lower()
+
+        if not gender_found and "Sexo:" in text:
+            gender_found = True
+            if "macho" in lower_text:
+                gender = "macho"
+            elif "hembra" in lower_text:
+                gender = "hembra"
+
+        if not birth_date_found and "Fecha de nacimiento" in text:
+            birth_date_found = True
+            date_match = BIRTH_DATE_RE.search(text)
+            if date_match:
+                birth_date = parse_birth_date(date_match.group(1))
+
+        if not age_found and "Edad:" in text:
+            age_found = True
+            if "cachorro" in lower_text or "gatito" in lower_text:
+                age = "cachorro"
+            elif "joven" in lower_text:
+                age = "joven"
+            elif "adulto" in lower_text:
+                age = "adulto"
+            elif "abuelo" in lower_text:
+                age = "abuelo"
+
+        if gender_found and birth_date_found and age_found:
+            break
+
+    return {
+        'description': description,
+        'birth_date': birth_date,
+        'gender': gender,
+        'age': age
+    }
+
+
 class NuevaVidaScraper(BaseBeautifulSoupScraper):
     """Scraper for Nuevavida website / Скрапер для сайта Nuevavida"""
     
-    def __init__(self):
+    BASE_URL = "https://adoptargatosmadrid-nuevavida.org/gatos-en-adopcion/"
+
+    def __init__(self, base_url: str = BASE_URL, **kwargs):
         """Initialize the scraper / Инициализация скрапера"""
-        super().__init__("https://adoptargatosmadrid-nuevavida.org/gatos-en-adopcion/")
+        super().__init__(base_url, **kwargs)
         self.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
@@ -21,7 +99,7 @@ class NuevaVidaScraper(BaseBeautifulSoupScraper):
         try:
             self.logger.info(f"Attempting to fetch page: {url}")
             self.logger.debug(f"Using headers: {self.headers}")
-            response = requests.get(url, headers=self.headers, timeout=30)
+            response = self.fetch(url, timeout=30)
             self.logger.info(f"Response status: {response.status_code}")
             self.logger.debug(f"Response headers: {dict(response.headers)}")
             
@@ -102,11 +180,11 @@ class NuevaVidaScraper(BaseBeautifulSoupScraper):
 
     def parse_birth_date(self, date_str: str) -> datetime:
         """Конвертирует строковую дату в объект datetime"""
-        try:
-            # Предполагаем формат даты DD/MM/YYYY
-            return datetime.strptime(date_str, "%d/%m/%Y")
-        except ValueError:
-            return None
+        return parse_birth_date(date_str)
+
+    def parse_detailed_info(self, html: str) -> Dict[str, Any]:
+        """Parse a cat's detail page / Разбор детальной страницы кота"""
+        return parse_detail_page(html, self.parser)
 
     def extract_detailed_info(self, url: str) -> Dict[str, Any]:
         """Extract detailed information from cat's page / Извлечение детальной информации со страницы кота"""
@@ -115,128 +193,103 @@ class NuevaVidaScraper(BaseBeautifulSoupScraper):
            
             if not html:
                 return {}
-                
-            soup = BeautifulSoup(html, 'html.parser')
-            
-            # Extract description
-            description_element = soup.select_one('.elementor-widget-theme-post-excerpt .elementor-widget-container')
-            description = description_element.get_text(strip=True) if description_element else ""
 
-            # Extract gender from description
-            gender_element = soup.select_one('.elementor-widget-text-editor:contains("Sexo:")')
-            gender = "unknown"
-            if gender_element:
-                gender_text = gender_element.get_text(strip=True).lower()
-                if "macho" in gender_text:
-                    gender = "macho"
-                elif "hembra" in gender_text:
-                    gender = "hembra"
-
-            # Extract birth date
-            birth_date_element = soup.select_one('.elementor-widget-text-editor:contains("Fecha de nacimiento")')
-            birth_date = None
-            if birth_date_element:
-                try:
-                    date_text = birth_date_element.get_text(strip=True)
-                    date_match = re.search(r'(\d{2}/\d{2}/\d{4})', date_text)
-                    if date_match:
-                        birth_date = datetime.strptime(date_match.group(1), '%d/%m/%Y')
-                except Exception as e:
-                    print(f"Error parsing birth date: {e}")
-
-            # Extract age
-            age_element = soup.select_one('.elementor-widget-text-editor:contains("Edad:")')
-            age = "unknown"
-            if age_element:
-                age_text = age_element.get_text(strip=True).lower()
-                print(f"Found age in detailed info: {age_text}")
-                if "cachorro" in age_text or "gatito" in age_text:
-                    age = "cachorro"
-                elif "joven" in age_text:
-                    age = "joven"
-                elif "adulto" in age_text:
-                    age = "adulto"
-                elif "abuelo" in age_text:
-                    age = "abuelo"
+            detailed_info = self.parse_detailed_info(html)
 
             print(f"Extracted detailed info:")
-            print(f"Description: {description}")
-            print(f"Gender: {gender}")
-            print(f"Birth date: {birth_date}")
+            print(f"Description: {detailed_info['description']}")
+            print(f"Gender: {detailed_info['gender']}")
+            print(f"Birth date: {detailed_info['birth_date']}")
+            print(f"Age: {detailed_info['age']}")
 
-            return {
-                'description': description,
-                'birth_date': birth_date,
-                'gender': gender,
-                'age': age
-            }
+            return detailed_info
             
         except Exception as e:
             print(f"Error extracting detailed info: {str(e)}")
             return {}
 
-    def extract_animals(self) -> List[Dict[str, Any]]:
-        """Extract information about cats using BeautifulSoup / Извлечение информации о котах с помощью BeautifulSoup"""
-        animals = []
+    def parse_listing(self, html: str) -> List[BeautifulSoup]:
+        """Cat cards of the listing page / Карточки котов на странице списка"""
+        return self.parse(html, LISTING_STRAINER).find_all('li', class_='product')
+
+    def iter_animals(self) -> Iterator[Dict[str, Any]]:
+        """
+        Yield cats in listing order as their details are ready / Выдает котов в порядке списка по мере готовности деталей.
+        Detail pages are fetched in chunks, so only one chunk is held in memory / Детальные страницы загружаются частями,
+        в памяти только одна часть. Errors are raised to the caller / Ошибки пробрасываются вызывающему.
+        """
         html = self.get_page(self.base_url)
-        
         if not html:
-            print("Could not get HTML page")
-            return animals
-            
+            # Иначе приют засчитался бы успешно обработанным с 0 животных / Otherwise the shelter would count as done with 0 animals
+            raise RuntimeError(f"Could not get listing page {self.base_url}")
+
         print(f"\nRetrieved HTML length: {len(html)}")
-        
-        soup = BeautifulSoup(html, 'html.parser')
+
+        # Find all cat cards / Поиск всех карточек котов
+        cat_cards = self.parse_listing(html)
+        del html
+        print(f"\nFound cat cards: {len(cat_cards)}")
+
+        # Extract basic information / Извлечение базовой информации
+        cards_info = []
+        for card in cat_cards:
+            print("\nProcessing new cat card...")
+            basic_info = self.extract_basic_info(card)
+            if not basic_info:
+                print("Failed to extract basic info")
+                continue
+            basic_info['card_fingerprint'] = self.card_fingerprint(basic_info)
+            print(f"Basic info extracted: {basic_info}")
+            cards_info.append(basic_info)
+        del cat_cards
+
+        extracted = 0
+        for start in range(0, len(cards_info), self.stream_chunk_size):
+            chunk = cards_info[start:start + self.stream_chunk_size]
+
+            # Reuse stored details for unchanged cards / Повторное использование сохраненных деталей для неизмененных карточек
+            details = [self.stored_details(basic_info) for basic_info in chunk]
+            changed = [index for index, detailed_info in enumerate(details) if detailed_info is None]
+            print(f"\nCards {start + 1}-{start + len(chunk)}: {len(chunk) - len(changed)} unchanged, "
+                  f"detail pages to fetch: {len(changed)}")
+
+            # Fetch detail pages on threads and parse them in the process pool, keeping card order
+            # Загрузка детальных страниц в потоках и разбор в пуле процессов с сохранением порядка карточек
+            fetched = self.fetch_and_parse(
+                [chunk[index]['source_url'] for index in changed],
+                parse_detail_page, self.parser
+            )
+            for index, detailed_info in zip(changed, fetched):
+                details[index] = detailed_info or self.fallback_details(chunk[index])
+
+            # Combine information / Объединение информации
+            for basic_info, detailed_info in zip(chunk, details):
+                print(f"Detailed info extracted: {detailed_info}")
+                extracted += 1
+                print(f"Successfully extracted all data for: {basic_info['name']}")
+                yield {
+                    **basic_info,
+                    **detailed_info,
+                    "is_adopted": False
+                }
+
+        print(f"\nTotal animals extracted: {extracted}")
+
+    def extract_animals(self) -> List[Dict[str, Any]]:
+        """Extract information about cats using BeautifulSoup / Извлечение информации о котах с помощью BeautifulSoup"""
+        animals = []
         try:
-            # Find all cat cards / Поиск всех карточек котов
-            cat_cards = soup.select('li.product')
-            print(f"\nFound cat cards: {len(cat_cards)}")
-            
-            # Process cards / Обработка карточек
-            for card in cat_cards:
-                try:
-                    print("\nProcessing new cat card...")
-                    # Extract basic information / Извлечение базовой информации
-                    basic_info = self.extract_basic_info(card)
-                    if not basic_info:
-                        print("Failed to extract basic info")
-                        continue
-                    
-                    print(f"Basic info extracted: {basic_info}")
-                    
-                    # Extract detailed information / Извлечение детальной информации
-                    detailed_info = self.extract_detailed_info(basic_info['source_url'])
-                    print(f"Detailed info extracted: {detailed_info}")
-
-                    # Combine information / Объединение информации
-                    animal_data = {
-                        **basic_info,
-                        **detailed_info,
-                        "is_adopted": False
-                    }
-                    
-                    animals.append(animal_data)
-                    print(f"Successfully extracted all data for: {basic_info['name']}")
-                    
-                    # Add small delay between requests / Добавление небольшой задержки между запросами
-                    sleep(1)
-                    
-                except Exception as e:
-                    print(f"Error processing card: {str(e)}")
-                    continue
-                    
+            for animal_data in self.iter_animals():
+                animals.append(animal_data)
         except Exception as e:
             print(f"Error in extract_animals: {str(e)}")
-            
-        print(f"\nTotal animals extracted: {len(animals)}")
         return animals
 
-    def run(self) -> tuple[List[Dict[str, Any]], Dict[str, str]]:
-        
-        animals = self.extract_animals()
-        shelter_info = {
+    def extract_shelter_info(self) -> Dict[str, str]:
+        """Shelter information / Информация о приюте"""
+        return {
             "name": "NUEVAVIDA Adopciones",
             "address": "Apartado de correos, 58 - 28220 Majadahonda, Madrid",
-            "description": "NUEVAVIDA Adopciones es una asociación sin ánimo de lucro que se dedica a la protección y adopción de gatos."
-        }
-        return animals, shelter_info 
\ No newline at end of file
+            "description": "NUEVAVIDA Adopciones es una asociación sin ánimo de lucro que se dedica a la protección y adopción de gatos.",
+            "website": self.base_url
+        }
\ No newline at end of file
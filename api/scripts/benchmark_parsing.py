@@ -0,0 +1,125 @@
+"""
+Микробенчмарк разбора HTML в NuevaVidaScraper на сохраненных страницах (scripts/fixtures).
+
+Прежний путь: BeautifulSoup(html, 'html.parser') по всему документу и три select_one с :contains(...)
+на детальной странице.
+Текущий путь: выбранный парсер (lxml, если установлен), SoupStrainer только по нужным блокам
+и один проход по .elementor-widget-text-editor.
+
+Пример:
+    python -m scripts.benchmark_parsing --repeat 20
+"""
+import argparse
+import os
+import re
+import sys
+from datetime import datetime
+from time import perf_counter
+from typing import Any, Callable, Dict, List
+
+from bs4 import BeautifulSoup
+
+# Добавляем текущую директорию в PYTHONPATH
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from scrapers.base_beautifulsoup_scraper import default_parser
+from scrapers.web.nuevavida_scraper import NuevaVidaScraper
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def legacy_listing(html: str) -> List[Any]:
+    """Копия прежнего разбора списка из extract_animals"""
+    return BeautifulSoup(html, 'html.parser').select('li.product')
+
+
+def legacy_detail(html: str) -> Dict[str, Any]:
+    """Копия прежнего разбора из extract_detailed_info (без загрузки и print)"""
+    soup = BeautifulSoup(html, 'html.parser')
+
+    description_element = soup.select_one('.elementor-widget-theme-post-excerpt .elementor-widget-container')
+    description = description_element.get_text(strip=True) if description_element else ""
+
+    gender_element = soup.select_one('.elementor-widget-text-editor:contains("Sexo:")')
+    gender = "unknown"
+    if gender_element:
+        gender_text = gender_element.get_text(strip=True).lower()
+        if "macho" in gender_text:
+            gender = "macho"
+        elif "hembra" in gender_text:
+            gender = "hembra"
+
+    birth_date_element = soup.select_one('.elementor-widget-text-editor:contains("Fecha de nacimiento")')
+    birth_date = None
+    if birth_date_element:
+        date_match = re.search(r'(\d{2}/\d{2}/\d{4})', birth_date_element.get_text(strip=True))
+        if date_match:
+            birth_date = datetime.strptime(date_match.group(1), '%d/%m/%Y')
+
+    age_element = soup.select_one('.elementor-widget-text-editor:contains("Edad:")')
+    age = "unknown"
+    if age_element:
+        age_text = age_element.get_text(strip=True).lower()
+        if "cachorro" in age_text or "gatito" in age_text:
+            age = "cachorro"
+        elif "joven" in age_text:
+            age = "joven"
+        elif "adulto" in age_text:
+            age = "adulto"
+        elif "abuelo" in age_text:
+            age = "abuelo"
+
+    return {'description': description, 'birth_date': birth_date, 'gender': gender, 'age': age}
+
+
+def load_fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def measure(func: Callable[[], Any], repeat: int) -> float:
+    """Лучшее время одного прогона в секундах"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = perf_counter()
+        func()
+        best = min(best, perf_counter() - started)
+    return best
+
+
+def card_urls(cards: List[Any]) -> List[str]:
+    return [card.find('a', class_='woocommerce-LoopProduct-link')['href'] for card in cards]
+
+
+def main(repeat: int) -> None:
+    listing_html = load_fixture("nuevavida_listing.html")
+    detail_html = load_fixture("nuevavida_detail.html")
+    parsers = ["html.parser"] + (["lxml"] if default_parser() == "lxml" else [])
+    scrapers = {parser: NuevaVidaScraper(parser=parser, use_cache=False) for parser in parsers}
+
+    # Результаты должны совпадать с прежним разбором
+    expected_cards = card_urls(legacy_listing(listing_html))
+    expected_detail = legacy_detail(detail_html)
+    for parser, scraper in scrapers.items():
+        assert card_urls(scraper.parse_listing(listing_html)) == expected_cards, f"listing mismatch ({parser})"
+        assert scraper.parse_detailed_info(detail_html) == expected_detail, f"detail mismatch ({parser})"
+
+    print(f"Listing: {len(listing_html) / 1024:.0f} KiB, {len(expected_cards)} cards; "
+          f"detail: {len(detail_html) / 1024:.0f} KiB; best of {repeat}")
+    for page, html, legacy, current in (
+        ("listing", listing_html, legacy_listing, lambda scraper, html: scraper.parse_listing(html)),
+        ("detail", detail_html, legacy_detail, lambda scraper, html: scraper.parse_detailed_info(html)),
+    ):
+        before = measure(lambda: legacy(html), repeat)
+        print(f"{page:8} before (html.parser, full tree): {before * 1000:8.2f} ms")
+        for parser, scraper in scrapers.items():
+            after = measure(lambda: current(scraper, html), repeat)
+            print(f"{page:8} after  ({parser}, scoped):{' ' * (11 - len(parser))}{after * 1000:8.2f} ms  "
+                  f"speedup {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Микробенчмарк разбора страниц NuevaVida")
+    parser.add_argument("--repeat", type=int, default=20, help="Число повторов")
+    args = parser.parse_args()
+    main(args.repeat)
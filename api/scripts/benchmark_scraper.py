@@ -0,0 +1,285 @@
+"""
+Офлайн-бенчмарк NuevaVidaScraper: сохраненные страницы (scripts/fixtures) отдаются локальным
+HTTP-сервером вместо сайта приюта, так что прогоны воспроизводимы и не требуют сети.
+
+Список либо берется из сохраненной страницы как есть, либо генерируется с --cards карточками
+по образцу первой карточки; все детальные страницы отдают сохраненную детальную страницу.
+Сервер поддерживает ETag / If-None-Match (для проверки кэша), gzip и искусственную задержку.
+
+Отчет по каждому прогону: страниц в секунду, время разбора на страницу, переданные байты,
+ответы 304 и пиковая память (RSS процесса; с --trace-memory - пик аллокаций Python).
+Детальные страницы разбираются в пуле процессов (--parse-workers, 0 - в потоке скрапера);
+время их разбора берется из статистики конвейера, пик очереди показывает ограничение памяти.
+
+Примеры:
+    python -m scripts.benchmark_scraper --cards 1000 --workers 8 --latency-ms 50
+    python -m scripts.benchmark_scraper --cards 500 --cache --runs 2 --parser html.parser
+    python -m scripts.benchmark_scraper --cards 1000 --parse-workers 0 --queue-size 8
+"""
+import argparse
+import contextlib
+import gzip
+import hashlib
+import io
+import logging
+import os
+import re
+import resource
+import sys
+import tempfile
+import threading
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter, sleep
+from typing import Any, Dict, List, Optional
+
+# Добавляем текущую директорию в PYTHONPATH
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from scrapers.http_cache import HTTPCache
+from scrapers.pipeline import shutdown_parse_pool
+from scrapers.throttle import AdaptiveRateLimiter
+from scrapers.web.nuevavida_scraper import NuevaVidaScraper
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+SITE_ORIGIN = "https://adoptargatosmadrid-nuevavida.org"
+LISTING_PATH = "/gatos-en-adopcion/"
+CARD_RE = re.compile(r'<li class="product .*?</li>\s*', re.S)
+NAMES = ["Luna", "Simba", "Nala", "Tom", "Mia", "Coco", "Kira", "Leo", "Bimba", "Max", "Lola", "Oliver"]
+
+
+def load_fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def synthetic_listing(listing_html: str, cards: int) -> str:
+    """Список с cards карточками, построенными по первой карточке сохраненной страницы"""
+    template = CARD_RE.search(listing_html).group(0)
+    template_url = re.search(r'href="([^"]+)"', template).group(1)
+    template_name = re.search(r'loop-product__title">([^<]+)<', template).group(1)
+
+    generated = []
+    for i in range(cards):
+        name = f"{NAMES[i % len(NAMES)]} {i}"
+        sex = "macho" if i % 2 else "hembra"
+        url = f"{SITE_ORIGIN}{LISTING_PATH}{sex}/gato-{i}/"
+        card = template.replace(template_url, url).replace(template_name, name)
+        generated.append(card.replace("-300x300.jpg", f"-{i}-300x300.jpg"))
+
+    first = CARD_RE.search(listing_html)
+    rest = CARD_RE.sub("", listing_html[first.start():])
+    return listing_html[:first.start()] + "".join(generated) + rest
+
+
+class FixtureSite:
+    """Локальная замена сайта приюта на ThreadingHTTPServer"""
+
+    def __init__(self, listing_html: str, detail_html: str, latency: float = 0.0, compress: bool = False) -> None:
+        self.latency = latency
+        self.compress = compress
+        self.lock = threading.Lock()
+        self.reset()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.origin = f"http://127.0.0.1:{self.server.server_port}"
+        # Абсолютные ссылки страниц указывают на локальный сервер
+        self.pages = {
+            "listing": listing_html.replace(SITE_ORIGIN, self.origin).encode("utf-8"),
+            "detail": detail_html.replace(SITE_ORIGIN, self.origin).encode("utf-8")
+        }
+        self.etags = {kind: '"' + hashlib.sha1(body).hexdigest() + '"' for kind, body in self.pages.items()}
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.requests = 0
+            self.not_modified = 0
+            self.bytes_sent = 0
+
+    def _handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                if site.latency:
+                    sleep(site.latency)
+                kind = "listing" if self.path.rstrip("/") == LISTING_PATH.rstrip("/") else "detail"
+                body, etag = site.pages[kind], site.etags[kind]
+
+                if self.headers.get("If-None-Match") == etag:
+                    with site.lock:
+                        site.requests += 1
+                        site.not_modified += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                encoding = None
+                if site.compress and "gzip" in self.headers.get("Accept-Encoding", ""):
+                    body, encoding = gzip.compress(body, compresslevel=6), "gzip"
+                with site.lock:
+                    site.requests += 1
+                    site.bytes_sent += len(body)
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=UTF-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                if encoding:
+                    self.send_header("Content-Encoding", encoding)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self) -> "FixtureSite":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class InstrumentedScraper(NuevaVidaScraper):
+    """NuevaVidaScraper с замером времени разбора HTML"""
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.parse_lock = threading.Lock()
+        self.parse_time = 0.0
+        self.parsed_pages = 0
+
+    def parse(self, html, parse_only=None):
+        started = perf_counter()
+        soup = super().parse(html, parse_only)
+        elapsed = perf_counter() - started
+        with self.parse_lock:
+            self.parse_time += elapsed
+            self.parsed_pages += 1
+        return soup
+
+
+def known_from(animals: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Та же структура, что и load_known_animals в run_scraper"""
+    return {
+        animal["source_url"]: {
+            key: animal.get(key) for key in ("card_fingerprint", "description", "birth_date", "gender", "age")
+        }
+        for animal in animals
+    }
+
+
+def peak_rss_mib() -> float:
+    # ru_maxrss в килобайтах на Linux (в байтах на macOS)
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divisor
+
+
+def run_once(site: FixtureSite, args: argparse.Namespace, cache: Optional[HTTPCache],
+             known: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    rate_limiter = AdaptiveRateLimiter(rate=args.rate, max_rate=max(args.rate, args.max_rate),
+                                       max_concurrent=args.per_host_limit)
+    # Кэш и контрольные точки задаются явно: общий кэш в api/.cache не открывается
+    scraper = InstrumentedScraper(base_url=site.origin + LISTING_PATH, max_workers=args.workers,
+                                  rate_limiter=rate_limiter, parser=args.parser,
+                                  cache=cache, use_cache=cache is not None, checkpoint=None)
+    scraper.known_animals = known
+    scraper.pipeline_queue_size = args.queue_size
+    scraper.logger.setLevel(logging.WARNING)
+
+    site.reset()
+    if args.trace_memory:
+        tracemalloc.start()
+    started = perf_counter()
+    # Скрапер печатает каждую карточку; вывод не нужен, но его стоимость остается в замере
+    with contextlib.redirect_stdout(io.StringIO()):
+        animals = scraper.extract_animals()
+    elapsed = perf_counter() - started
+    traced_peak = tracemalloc.get_traced_memory()[1] if args.trace_memory else None
+    if args.trace_memory:
+        tracemalloc.stop()
+
+    # Детальные страницы разбираются вне InstrumentedScraper.parse - в конвейере
+    pipeline = scraper.pipeline_stats
+    return {
+        "animals": animals,
+        "elapsed": elapsed,
+        "requests": site.requests,
+        "not_modified": site.not_modified,
+        "bytes": site.bytes_sent,
+        "parsed_pages": scraper.parsed_pages + pipeline.get("parsed", 0),
+        "parse_time": scraper.parse_time + pipeline.get("parse_seconds", 0.0),
+        "queue_peak": pipeline.get("queue_peak", 0),
+        "traced_peak": traced_peak
+    }
+
+
+def main(args: argparse.Namespace) -> None:
+    listing_html = load_fixture("nuevavida_listing.html")
+    if args.cards:
+        listing_html = synthetic_listing(listing_html, args.cards)
+    detail_html = load_fixture("nuevavida_detail.html")
+
+    cache_dir = tempfile.TemporaryDirectory() if args.cache else None
+    cache = HTTPCache(path=os.path.join(cache_dir.name, "http_cache.sqlite")) if cache_dir else None
+    os.environ["SCRAPER_PARSE_WORKERS"] = str(args.parse_workers)
+    print(f"parser={args.parser or 'default'} workers={args.workers} per_host_limit={args.per_host_limit} "
+          f"rate={args.rate}/s latency={args.latency_ms}ms gzip={args.gzip} cache={args.cache} "
+          f"incremental={args.incremental} parse_workers={args.parse_workers} queue_size={args.queue_size}")
+    print(f"{'run':>3} {'animals':>8} {'requests':>9} {'304':>5} {'seconds':>8} {'pages/s':>8} "
+          f"{'parse ms/page':>14} {'queue':>6} {'KiB sent':>9} {'peak MiB':>9}")
+
+    known: Dict[str, Dict[str, Any]] = {}
+    try:
+        with FixtureSite(listing_html, detail_html, args.latency_ms / 1000, args.gzip) as site:
+            for run in range(1, args.runs + 1):
+                result = run_once(site, args, cache, known)
+                if args.incremental:
+                    known = known_from(result["animals"])
+                pages = result["requests"] or 1
+                parse_ms = result["parse_time"] / result["parsed_pages"] * 1000 if result["parsed_pages"] else 0.0
+                peak = (result["traced_peak"] / (1024 * 1024) if result["traced_peak"] is not None
+                        else peak_rss_mib())
+                print(
+                    f"{run:>3} {len(result['animals']):>8} {result['requests']:>9} {result['not_modified']:>5} "
+                    f"{result['elapsed']:>8.2f} {pages / result['elapsed']:>8.1f} {parse_ms:>14.2f} "
+                    f"{result['queue_peak']:>6} {result['bytes'] / 1024:>9.0f} {peak:>9.1f}"
+                )
+    finally:
+        shutdown_parse_pool()
+        if cache_dir:
+            cache_dir.cleanup()
+    print("peak MiB: " + ("Python allocations (tracemalloc)" if args.trace_memory else "process max RSS")
+          + "; queue: peak pages waiting for the parse pool")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Офлайн-бенчмарк NuevaVidaScraper на сохраненных страницах")
+    parser.add_argument("--cards", type=int, default=0,
+                        help="Сгенерировать список с указанным числом карточек (0 - сохраненный список как есть)")
+    parser.add_argument("--runs", type=int, default=1, help="Число прогонов подряд (кэш и known_animals сохраняются)")
+    parser.add_argument("--workers", type=int, default=4, help="Потоков загрузки детальных страниц")
+    parser.add_argument("--per-host-limit", type=int, default=4, help="Одновременных запросов к хосту")
+    parser.add_argument("--rate", type=float, default=1000.0, help="Начальная скорость ограничителя, запросов/с")
+    parser.add_argument("--max-rate", type=float, default=1000.0, help="Максимальная скорость ограничителя, запросов/с")
+    parser.add_argument("--parse-workers", type=int, default=os.cpu_count() or 1,
+                        help="Процессов разбора детальных страниц (0 - разбор в потоке скрапера)")
+    parser.add_argument("--queue-size", type=int, default=16,
+                        help="Сколько загруженных страниц может ждать разбора")
+    parser.add_argument("--parser", default=None, help="Парсер BeautifulSoup (lxml, html.parser)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Искусственная задержка ответа сервера")
+    parser.add_argument("--gzip", action="store_true", help="Сервер сжимает ответы gzip")
+    parser.add_argument("--cache", action="store_true", help="Кэш условных GET (во временной директории)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Передавать результаты прогона как known_animals следующему")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Измерять пик аллокаций через tracemalloc (замедляет прогон)")
+    main(parser.parse_args())
@@ -0,0 +1,123 @@
+"""
+Микробенчмарк сериализации списка животных: прежний путь get_animals против текущего.
+
+Прежний путь: построчный INFO-лог строки и результата, промежуточный объект Animal + to_dict(),
+затем валидация FastAPI по response_model и json.dumps в JSONResponse.
+Текущий путь: rows_to_animals + encode_animals (одна валидация и сразу JSON-байты).
+
+Пример:
+    python -m scripts.benchmark_serialization --rows 1000 --repeat 20
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timedelta
+from time import perf_counter
+from typing import Callable, List
+
+# Добавляем текущую директорию в PYTHONPATH
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from main import ANIMAL_FIELDS, ANIMAL_LIST_ADAPTER, rows_to_animals, encode_animals
+
+
+class LegacyAnimal:
+    """Копия прежнего промежуточного объекта из main.py"""
+
+    def __init__(self, id, name, age, gender, description, birth_date,
+                 image_url, source_url, shelter_id, is_adopted=False):
+        self.id = id
+        self.name = name
+        self.age = age
+        self.gender = gender
+        self.description = description
+        self.birth_date = birth_date
+        self.image_url = image_url
+        self.source_url = source_url
+        self.shelter_id = shelter_id
+        self.is_adopted = is_adopted
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "age": self.age,
+            "gender": self.gender,
+            "description": self.description,
+            "birth_date": self.birth_date.isoformat() if self.birth_date else None,
+            "image_url": self.image_url,
+            "source_url": self.source_url,
+            "shelter_id": self.shelter_id,
+            "is_adopted": self.is_adopted
+        }
+
+
+def make_rows(count: int) -> List[tuple]:
+    """Синтетические строки в порядке ANIMAL_FIELDS"""
+    born = datetime(2020, 1, 1)
+    return [
+        (
+            i, f"Gato {i}", "adulto", "macho" if i % 2 else "hembra",
+            "Muy cariñoso y tranquilo, busca un hogar definitivo. " * 4,
+            born + timedelta(days=i), f"https://example.org/img/{i}.jpg",
+            f"https://example.org/gato/{i}/", 1, False
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+def legacy_path(rows: List[tuple], logger: logging.Logger) -> bytes:
+    animals = []
+    for row in rows:
+        logger.info(f"Raw data from DB: {row}")
+        animal_dict = LegacyAnimal(*row).to_dict()
+        logger.info(f"Processed animal data: {animal_dict}")
+        animals.append(animal_dict)
+    # FastAPI: валидация по response_model, затем JSONResponse
+    content = ANIMAL_LIST_ADAPTER.dump_python(ANIMAL_LIST_ADAPTER.validate_python(animals), mode="json")
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def current_path(rows: List[tuple]) -> bytes:
+    return encode_animals(rows_to_animals(ANIMAL_FIELDS, rows))
+
+
+def measure(func: Callable[[], bytes], repeat: int) -> float:
+    """Лучшее время одного прогона в секундах"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = perf_counter()
+        func()
+        best = min(best, perf_counter() - started)
+    return best
+
+
+def main(row_count: int, repeat: int) -> None:
+    rows = make_rows(row_count)
+
+    # Прежние INFO-логи пишем в память, чтобы учесть стоимость форматирования без вывода в консоль
+    legacy_logger = logging.getLogger("benchmark.legacy")
+    legacy_logger.propagate = False
+    legacy_logger.setLevel(logging.INFO)
+    handler = logging.StreamHandler(io.StringIO())
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    legacy_logger.addHandler(handler)
+
+    before = measure(lambda: legacy_path(rows, legacy_logger), repeat)
+    after = measure(lambda: current_path(rows), repeat)
+
+    print(f"Rows: {row_count}, best of {repeat}")
+    print(f"before: {before * 1000:8.2f} ms total, {before / row_count * 1e6:7.2f} us/row")
+    print(f"after:  {after * 1000:8.2f} ms total, {after / row_count * 1e6:7.2f} us/row")
+    print(f"speedup: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Микробенчмарк сериализации GET /api/animals")
+    parser.add_argument("--rows", type=int, default=1000, help="Число строк в ответе")
+    parser.add_argument("--repeat", type=int, default=20, help="Число повторов")
+    args = parser.parse_args()
+    main(args.rows, args.repeat)
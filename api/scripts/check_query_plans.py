@@ -0,0 +1,151 @@
+"""
+Проверка планов запросов API: заполняет локальную базу синтетическими животными,
+выполняет EXPLAIN для запросов эндпоинтов и проверяет, что используются нужные индексы.
+
+Запускать только на локальной/тестовой базе с примененными миграциями (alembic upgrade head).
+Синтетические данные создаются под отдельным приютом и удаляются в конце (если не указан --keep).
+
+Пример:
+    python -m scripts.check_query_plans --rows 50000
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict, Iterator, List, Set, Tuple
+
+import psycopg2
+
+# Добавляем текущую директорию в PYTHONPATH
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from db_pool import connection_params
+from main import ANIMAL_FIELDS, DEFAULT_PAGE_SIZE, build_animals_query
+
+SEED_SHELTER_NAMES = ("__query_plan_check__", "__query_plan_check_small__")
+
+
+def seed(cur, rows: int) -> int:
+    """Создает два приюта и rows животных; возвращает id маленького приюта (2% животных, все доступны)"""
+    shelter_ids = []
+    for name in SEED_SHELTER_NAMES:
+        cur.execute("INSERT INTO shelters (name) VALUES (%s) RETURNING id", (name,))
+        shelter_ids.append(cur.fetchone()[0])
+    # 20% доступных, 2 пола, 1% 'abuelo' и 3 частых возраста, 5% удаленных с сайта;
+    # редкие значения делают фильтры избирательными, чтобы планировщик выбирал их индексы
+    cur.execute("""
+        INSERT INTO animals (name, gender, age, description, image_url, source_url,
+                             is_adopted, shelter_id, removed_at, search_vector)
+        SELECT name, gender, age, description, image_url, source_url, is_adopted, shelter_id, removed_at,
+               setweight(to_tsvector('spanish', name), 'A') || setweight(to_tsvector('spanish', description), 'B')
+        FROM (
+            SELECT 'Gato ' || n AS name,
+                   (ARRAY['macho', 'hembra'])[1 + n %% 2] AS gender,
+                   CASE WHEN n %% 100 = 1 THEN 'abuelo'
+                        ELSE (ARRAY['cachorro', 'joven', 'adulto'])[1 + n %% 3] END AS age,
+                   -- 1%% описаний содержит редкое слово, чтобы поиск был избирательным
+                   repeat('Muy cariñoso y tranquilo. ', 10) || CASE WHEN n %% 100 = 0 THEN 'Positivo en FIV.' ELSE '' END
+                       AS description,
+                   'https://example.org/img/' || n || '.jpg' AS image_url,
+                   'https://example.org/query-plan-check/' || n || '/' AS source_url,
+                   n %% 5 <> 0 AS is_adopted,
+                   CASE WHEN n %% 50 = 5 THEN %s ELSE %s END AS shelter_id,
+                   CASE WHEN n %% 20 = 0 THEN now() END AS removed_at
+            FROM generate_series(1, %s) AS n
+        ) AS seed
+    """, (shelter_ids[1], shelter_ids[0], rows))
+    return shelter_ids[1]
+
+
+def cleanup(cur) -> None:
+    cur.execute("""
+        DELETE FROM animals WHERE shelter_id IN (SELECT id FROM shelters WHERE name IN %s)
+    """, (SEED_SHELTER_NAMES,))
+    cur.execute("DELETE FROM shelters WHERE name IN %s", (SEED_SHELTER_NAMES,))
+
+
+def plan_nodes(plan: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def used_indexes(cur, query: str, params: List[Any]) -> Tuple[Set[str], Dict[str, Any]]:
+    cur.execute("EXPLAIN (FORMAT JSON) " + query, params)
+    raw = cur.fetchone()[0]
+    plan = (raw if isinstance(raw, list) else json.loads(raw))[0]["Plan"]
+    return {node["Index Name"] for node in plan_nodes(plan) if "Index Name" in node}, plan
+
+
+def checks(shelter_id: int) -> List[Tuple[str, str, List[Any], Set[str]]]:
+    """
+    (описание, запрос, параметры, допустимые индексы).
+    Для фильтров ожидается именно их индекс: план по первичному ключу с фильтрацией строк
+    прошел бы и без него.
+    """
+    limit = DEFAULT_PAGE_SIZE + 1
+    return [
+        ("GET /api/animals?is_adopted=false",
+         *build_animals_query(None, None, None, False, limit=limit),
+         {"ix_animals_available"}),
+        ("GET /api/animals?shelter_id=..&is_adopted=false",
+         *build_animals_query(None, None, shelter_id, False, limit=limit),
+         {"ix_animals_shelter_status"}),
+        ("GET /api/animals?gender=..&age=..",
+         *build_animals_query("abuelo", "hembra", None, None, limit=limit),
+         {"ix_animals_gender_age"}),
+        ("GET /api/animals?cursor=.. (keyset)",
+         *build_animals_query(None, None, None, False, after_id=1000, limit=limit),
+         {"ix_animals_available"}),
+        ("GET /api/animals/{id}",
+         f"SELECT {', '.join(ANIMAL_FIELDS)} FROM animals WHERE id = %s", [1000],
+         {"animals_pkey", "ix_animals_id"}),
+        ("GET /api/animals?age=..",
+         *build_animals_query("abuelo", None, None, None, limit=limit),
+         {"ix_animals_age"}),
+        ("GET /api/animals?q=..",
+         *build_animals_query(None, None, None, None, limit=limit, q="FIV"),
+         {"ix_animals_search_vector"}),
+        ("GET /api/animals?q=..&cursor=.. (keyset)",
+         *build_animals_query(None, None, None, None, after_id=1000, limit=limit, q="FIV", after_rank=0.5),
+         {"ix_animals_search_vector"}),
+        ("run_scraper ON CONFLICT (source_url)",
+         "SELECT id FROM animals WHERE source_url = %s", ["https://example.org/query-plan-check/1/"],
+         {"ix_animals_source_url"}),
+    ]
+
+
+def main(rows: int, keep: bool) -> int:
+    conn = psycopg2.connect(**connection_params())
+    conn.autocommit = True
+    failures = 0
+    try:
+        with conn.cursor() as cur:
+            cleanup(cur)
+            print(f"Seeding {rows} animals...")
+            shelter_id = seed(cur, rows)
+            # VACUUM обновляет visibility map, чтобы планировщик мог выбрать index-only scan
+            cur.execute("VACUUM ANALYZE animals")
+
+            for description, query, params, expected in checks(shelter_id):
+                indexes, plan = used_indexes(cur, query, params)
+                ok = bool(indexes & expected)
+                failures += not ok
+                print(f"{'PASS' if ok else 'FAIL'}  {description}: {plan['Node Type']}, "
+                      f"indexes={sorted(indexes) or '-'}, expected one of {sorted(expected)}")
+    finally:
+        if not keep:
+            with conn.cursor() as cur:
+                cleanup(cur)
+        conn.close()
+
+    print(f"\n{failures} check(s) failed" if failures else "\nAll queries use the expected indexes")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Проверка использования индексов запросами API")
+    parser.add_argument("--rows", type=int, default=50000, help="Сколько синтетических животных создать")
+    parser.add_argument("--keep", action="store_true", help="Не удалять синтетические данные")
+    args = parser.parse_args()
+    sys.exit(main(args.rows, args.keep))
@@ -0,0 +1,75 @@
+"""
+Нагрузочный тест API: измеряет запросы в секунду при разном числе одновременных клиентов.
+
+Пример:
+    python -m scripts.load_test --url http://localhost:8000/api/animals --concurrency 1 2 4 8 16 32
+"""
+import argparse
+import asyncio
+import statistics
+from time import perf_counter
+from typing import Dict, List
+
+import aiohttp
+
+
+async def client(session: aiohttp.ClientSession, url: str, deadline: float,
+                 latencies: List[float], errors: List[int]) -> None:
+    """Один клиент отправляет запросы последовательно до истечения времени"""
+    while perf_counter() < deadline:
+        started = perf_counter()
+        try:
+            async with session.get(url) as response:
+                await response.read()
+                if response.status != 200:
+                    errors.append(response.status)
+                    continue
+        except aiohttp.ClientError:
+            errors.append(0)
+            continue
+        latencies.append(perf_counter() - started)
+
+
+async def run_level(url: str, concurrency: int, duration: float) -> Dict[str, float]:
+    """Запускает concurrency клиентов на duration секунд"""
+    latencies: List[float] = []
+    errors: List[int] = []
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        started = perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*[
+            client(session, url, deadline, latencies, errors) for _ in range(concurrency)
+        ])
+        elapsed = perf_counter() - started
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000 if latencies else 0.0
+    }
+
+
+async def main(url: str, levels: List[int], duration: float) -> None:
+    print(f"Load testing {url} for {duration}s per level")
+    print(f"{'clients':>8} {'requests':>9} {'errors':>7} {'rps':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    for concurrency in levels:
+        result = await run_level(url, concurrency, duration)
+        print(
+            f"{result['concurrency']:>8} {result['requests']:>9} {result['errors']:>7} "
+            f"{result['rps']:>9.1f} {result['p50_ms']:>9.1f} {result['p99_ms']:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Нагрузочный тест эндпоинтов API")
+    parser.add_argument("--url", default="http://localhost:8000/api/animals", help="URL для нагрузки")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32],
+                        help="Число одновременных клиентов для каждого прогона")
+    parser.add_argument("--duration", type=float, default=10.0, help="Длительность прогона в секундах")
+    args = parser.parse_args()
+    asyncio.run(main(args.url, args.concurrency, args.duration))
@@ -1,78 +1,402 @@
+import argparse
+import asyncio
 import os
 import sys
+from time import perf_counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Type
 
 # Добавляем текущую директорию в PYTHONPATH
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from config.settings import SessionLocal
+import requests
+from config.settings import SessionLocal, settings
+from image_cache import thumbnail_cache_from_env
 from models.database import Animal, Shelter
-from scrapers.web.nuevavida_scraper import NuevaVidaScraper
-from sqlalchemy import text
+from scrapers.base_beautifulsoup_scraper import BaseBeautifulSoupScraper
+from scrapers.checkpoint import checkpoint_from_env
+from scrapers.pipeline import shutdown_parse_pool
+from scrapers.registry import discover_scrapers
+from sqlalchemy import text, func, or_, literal, literal_column
+from sqlalchemy.dialects.postgresql import insert
 
-def main():
-    """Основная функция для запуска скрапера"""
-    try:
-        print("\nStarting scraper process...")
-        # Создаем сессию базы данных
-        session = SessionLocal()
-        
-        # Очищаем таблицу animals и сбрасываем последовательность
-        print("Clearing existing data...")
-        session.execute(text("TRUNCATE TABLE animals CASCADE;"))
-        session.execute(text("ALTER SEQUENCE animals_id_seq RESTART WITH 1;"))
+# Поля, которые приходят со скрапера и обновляются при изменении
+SYNC_COLUMNS = ("name", "gender", "age", "birth_date", "description", "image_url", "shelter_id", "card_fingerprint")
+# Поля карточки списка, которые обновляются, если детальная страница не загрузилась
+PARTIAL_SYNC_COLUMNS = ("name", "image_url", "shelter_id")
+# Сколько строк отправлять в одном INSERT ... ON CONFLICT
+UPSERT_BATCH_SIZE = 500
+# Сколько животных записывать в одной транзакции при потоковой синхронизации
+COMMIT_BATCH_SIZE = int(os.getenv('SCRAPER_COMMIT_BATCH', '100'))
+# Сколько приютов скрапится одновременно
+MAX_PARALLEL_SHELTERS = int(os.getenv('SCRAPER_MAX_PARALLEL', '4'))
+# Загружать ли миниатюры фотографий сразу после синхронизации
+PREWARM_THUMBNAILS = os.getenv('SCRAPER_PREWARM_THUMBNAILS', '1') == '1'
+# Конфигурация полнотекстового поиска (та же, что в миграции 7a2b96c3d445 и в запросах API)
+SEARCH_CONFIG = "spanish"
+
+
+def search_vector(name, description):
+    """tsvector для поиска: имя с весом A, описание с весом B"""
+    config = literal_column(f"'{SEARCH_CONFIG}'::regconfig")
+    return func.setweight(func.to_tsvector(config, func.coalesce(name, "")), literal("A")).op("||")(
+        func.setweight(func.to_tsvector(config, func.coalesce(description, "")), literal("B"))
+    )
+
+
+def get_or_create_shelter(session, shelter_info: Dict[str, str]) -> Shelter:
+    """Создает или получает приют"""
+    print(f"\nProcessing shelter: {shelter_info['name']}")
+    shelter = session.query(Shelter).filter(Shelter.name == shelter_info["name"]).first()
+    if not shelter:
+        shelter = Shelter(
+            name=shelter_info["name"],
+            address=shelter_info["address"],
+            description=shelter_info["description"],
+            website=shelter_info.get("website", "")
+        )
+        session.add(shelter)
         session.commit()
-        
-        # Запускаем скрапер
-        print("Starting scraper...")
-        scraper = NuevaVidaScraper()
-        animals, shelter_info = scraper.run()
-        print(f"Scraper finished. Found {len(animals)} animals")
-        
-        # Создаем или получаем приют
-        print(f"\nProcessing shelter: {shelter_info['name']}")
-        shelter = session.query(Shelter).filter(Shelter.name == shelter_info["name"]).first()
-        if not shelter:
-            shelter = Shelter(
-                name=shelter_info["name"],
-                address=shelter_info["address"],
-                description=shelter_info["description"],
-                website=shelter_info.get("website", "")
+        session.refresh(shelter)
+        print(f"Created new shelter with ID: {shelter.id}")
+    else:
+        print(f"Found existing shelter with ID: {shelter.id}")
+    return shelter
+
+
+def load_known_animals(session, shelter_id: int) -> Dict[str, Dict[str, Any]]:
+    """Сохраненные детали животных приюта по source_url (для пропуска неизмененных карточек)"""
+    rows = session.query(
+        Animal.source_url, Animal.card_fingerprint, Animal.description,
+        Animal.birth_date, Animal.gender, Animal.age
+    ).filter(Animal.shelter_id == shelter_id).all()
+    return {
+        row.source_url: {
+            "card_fingerprint": row.card_fingerprint,
+            "description": row.description,
+            "birth_date": row.birth_date,
+            "gender": row.gender,
+            "age": row.age
+        }
+        for row in rows
+    }
+
+
+def upsert_animals(session, shelter_id: int, animals: List[Dict[str, Any]],
+                   overwrite: bool = False) -> Dict[str, int]:
+    """
+    Пакетный INSERT ... ON CONFLICT (source_url) DO UPDATE.
+    Неизмененные строки не перезаписываются, is_adopted задается только при вставке.
+    overwrite (полная перезагрузка) перезаписывает все строки, включая is_adopted.
+    У животных с details_missing (детальная страница не загрузилась) обновляются только поля
+    карточки: детали и отпечаток остаются прежними, и карточка загрузится снова при следующем запуске.
+    """
+    table = Animal.__table__
+    full_rows, partial_rows = {}, {}
+    for animal_data in animals:
+        partial = animal_data.get("details_missing", False)
+        source_url = animal_data["source_url"]
+        full_rows.pop(source_url, None)
+        partial_rows.pop(source_url, None)
+        (partial_rows if partial else full_rows)[source_url] = {
+            "name": animal_data["name"],
+            "gender": animal_data.get("gender"),
+            "age": animal_data.get("age"),
+            "birth_date": animal_data.get("birth_date"),
+            "description": animal_data.get("description", ""),
+            "image_url": animal_data.get("image_url", ""),
+            "source_url": source_url,
+            "is_adopted": animal_data.get("is_adopted", False),
+            "shelter_id": shelter_id,
+            "card_fingerprint": None if partial else animal_data.get("card_fingerprint"),
+            "search_vector": search_vector(literal(animal_data["name"]), literal(animal_data.get("description", "")))
+        }
+
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+    for rows, partial in ((list(full_rows.values()), False), (list(partial_rows.values()), True)):
+        rewrite = overwrite and not partial
+        columns = PARTIAL_SYNC_COLUMNS if partial else SYNC_COLUMNS
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            batch = rows[start:start + UPSERT_BATCH_SIZE]
+            stmt = insert(table).values(batch)
+            changed = None if rewrite else or_(
+                table.c.removed_at.isnot(None),
+                *[table.c[column].is_distinct_from(stmt.excluded[column]) for column in columns]
             )
-            session.add(shelter)
-            session.commit()
-            session.refresh(shelter)
-            print(f"Created new shelter with ID: {shelter.id}")
+            description = table.c.description if partial else stmt.excluded.description
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.source_url],
+                set_={
+                    **{column: stmt.excluded[column] for column in columns + (("is_adopted",) if rewrite else ())},
+                    "search_vector": search_vector(stmt.excluded.name, description),
+                    "removed_at": None,
+                    "updated_at": func.now()
+                },
+                where=changed
+            ).returning(table.c.id, literal_column("(xmax = 0)").label("inserted"))
+
+            written = session.execute(stmt).fetchall()
+            inserted = sum(1 for row in written if row.inserted)
+            counts["inserted"] += inserted
+            counts["updated"] += len(written) - inserted
+            counts["unchanged"] += len(batch) - len(written)
+    return counts
+
+
+def mark_removed_animals(session, shelter_id: int, seen_urls: Iterable[str]) -> int:
+    """Помечает животных, которых больше нет на сайте приюта (без удаления)"""
+    table = Animal.__table__
+    result = session.execute(
+        table.update()
+        .where(table.c.shelter_id == shelter_id)
+        .where(table.c.removed_at.is_(None))
+        .where(table.c.source_url.notin_(list(seen_urls)))
+        .values(removed_at=func.now(), updated_at=func.now())
+    )
+    return result.rowcount
+
+
+def delete_unseen_animals(session, shelter_id: int, seen_urls: Iterable[str]) -> int:
+    """Удаляет животных приюта (и заявки на них), которых не было в полной перезагрузке"""
+    params = {"shelter_id": shelter_id, "seen_urls": list(seen_urls)}
+    session.execute(text("""
+        DELETE FROM adoption_requests
+        WHERE animal_id IN (
+            SELECT id FROM animals
+            WHERE shelter_id = :shelter_id AND NOT (source_url = ANY(:seen_urls))
+        )
+    """), params)
+    result = session.execute(text("""
+        DELETE FROM animals
+        WHERE shelter_id = :shelter_id AND NOT (source_url = ANY(:seen_urls))
+    """), params)
+    return result.rowcount
+
+
+def iter_batches(items: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Разбивает поток на списки по size элементов"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def sync_animals(session, name: str, shelter_id: int, animals: Iterable[Dict[str, Any]],
+                 full_refresh: bool = False) -> Tuple[Dict[str, int], Set[str]]:
+    """
+    Потоковая синхронизация животных приюта: каждые COMMIT_BATCH_SIZE животных записываются
+    и фиксируются отдельной транзакцией, так что в памяти только один пакет, а сбой в конце
+    обхода не теряет уже записанное. Отсутствующие на сайте животные помечаются (или удаляются
+    при полной перезагрузке) только после полного обхода. Возвращает счетчики и URL фотографий.
+    """
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0, "removed": 0}
+    seen_urls: Set[str] = set()
+    image_urls: Set[str] = set()
+    for batch in iter_batches(animals, COMMIT_BATCH_SIZE):
+        batch_counts = upsert_animals(session, shelter_id, batch, overwrite=full_refresh)
+        session.commit()
+        for key, value in batch_counts.items():
+            counts[key] += value
+        seen_urls.update(animal["source_url"] for animal in batch)
+        image_urls.update(animal["image_url"] for animal in batch if animal.get("image_url"))
+        print(f"[{name}] Committed {len(seen_urls)} animals so far")
+
+    # Пустой результат скорее означает сбой скрапера, чем пустой приют
+    if seen_urls:
+        if full_refresh:
+            counts["removed"] = delete_unseen_animals(session, shelter_id, seen_urls)
         else:
-            print(f"Found existing shelter with ID: {shelter.id}")
-        
-        # Сохраняем животных
-        print("\nSaving animals to database...")
-        for animal_data in animals:
-            try:
-                animal = Animal(
-                    name=animal_data["name"],
-                    gender=animal_data["gender"],
-                    age=animal_data["age"],
-                    birth_date=animal_data.get("birth_date"),
-                    description=animal_data.get("description", ""),
-                    image_url=animal_data.get("image_url", ""),
-                    source_url=animal_data["source_url"],
-                    is_adopted=animal_data.get("is_adopted", False),
-                    shelter_id=shelter.id
-                )
-                session.add(animal)
-                print(f"Added animal: {animal_data['name']}")
-            except Exception as e:
-                print(f"Error saving animal {animal_data.get('name', 'unknown')}: {str(e)}")
-        
+            counts["removed"] = mark_removed_animals(session, shelter_id, seen_urls)
         session.commit()
-        print(f"\nSuccessfully processed {len(animals)} animals")
-        
-    except Exception as e:
-        print(f"Error running scraper: {str(e)}")
+    return counts, image_urls
+
+
+def invalidate_api_cache() -> None:
+    """
+    Сбрасывает кэш ответов API; ошибки не критичны.
+    При старте контейнера (start.sh) скрапер работает до запуска uvicorn: API недоступен,
+    и сбрасывать нечего - его кэш еще пуст.
+    """
+    token = os.getenv('API_CACHE_INVALIDATE_TOKEN')
+    if not token:
+        print("API_CACHE_INVALIDATE_TOKEN is not set, skipping API cache invalidation")
+        return
+    try:
+        response = requests.post(
+            f"{settings.API_URL}/api/cache/invalidate", headers={"X-Cache-Token": token}, timeout=5
+        )
+        response.raise_for_status()
+        print(f"API cache invalidated: {response.json().get('removed', 0)} entries removed")
+    except requests.exceptions.ConnectionError:
+        print("API is not running, no cache to invalidate")
+    except requests.exceptions.RequestException as e:
+        print(f"Could not invalidate API cache: {str(e)}")
+
+
+def warm_thumbnails(name: str, scraper: BaseBeautifulSoupScraper, image_urls: Iterable[str]) -> None:
+    """
+    Создает миниатюры фотографий, которых еще нет в кэше API.
+    Изображения загружаются через ограничитель скорости скрапера; ошибки только логируются.
+    """
+    def fetch(url: str) -> bytes:
+        response = scraper.request(url, scraper.headers, timeout=30)
+        response.raise_for_status()
+        return response.content
+
+    cache = thumbnail_cache_from_env(fetch=fetch)
+    urls = sorted(set(image_urls))
+    missing = [url for url in urls if not cache.contains(url)]
+
+    def warm(url: str) -> bool:
+        try:
+            cache.get(url)
+            return True
+        except Exception as e:
+            print(f"[{name}] Could not create thumbnail for {url}: {str(e)}")
+            return False
+
+    created = sum(scraper.fetch_concurrently(warm, missing))
+    print(f"[{name}] Thumbnails: {len(urls) - len(missing)} cached, {created} created, {len(missing) - created} failed")
+
+
+def scrape_shelter(name: str, scraper_class: Type[BaseBeautifulSoupScraper], full_refresh: bool,
+                   prewarm: bool = PREWARM_THUMBNAILS) -> Dict[str, int]:
+    """
+    Скрапит один приют и синхронизирует его животных в отдельной сессии по мере извлечения.
+    Выполняется в своем потоке; ошибки пробрасываются и обрабатываются в run_shelter
+    (уже зафиксированные пакеты при этом сохраняются). Прерванный обход продолжается
+    следующим запуском с контрольной точки: загружаются только оставшиеся страницы.
+    """
+    session = SessionLocal()
+    checkpoint = checkpoint_from_env(name)
+    try:
+        scraper = scraper_class()
+        scraper.checkpoint = checkpoint
+        if checkpoint and checkpoint.resumed:
+            done = checkpoint.stats()["done"]
+            print(f"[{name}] Resuming interrupted crawl run {checkpoint.run_id} ({done} pages already done)")
+        shelter = get_or_create_shelter(session, scraper.extract_shelter_info())
+        if not full_refresh:
+            # Детальные страницы загружаются только для новых или измененных карточек
+            scraper.known_animals = load_known_animals(session, shelter.id)
+            print(f"[{name}] Loaded {len(scraper.known_animals)} known animals")
+
+        print(f"[{name}] Starting scraper...")
+        # Полная перезагрузка перезаписывает строки и удаляет лишние в конце: API не увидит пустой приют
+        counts, image_urls = sync_animals(session, name, shelter.id, scraper.iter_animals(), full_refresh)
+        scraper.log_connection_stats()
+        if checkpoint:
+            # Обход завершен и записан: следующий запуск начнется заново
+            checkpoint.finish()
+        processed = counts["inserted"] + counts["updated"] + counts["unchanged"]
+        print(
+            f"[{name}] Successfully processed {processed} animals: "
+            f"{counts['inserted']} inserted, {counts['updated']} updated, "
+            f"{counts['unchanged']} unchanged, {counts['removed']} marked as removed"
+        )
+        # Результаты приюта видны в API сразу, не дожидаясь остальных
+        invalidate_api_cache()
+    except Exception:
         session.rollback()
+        raise
     finally:
         session.close()
+        if checkpoint:
+            checkpoint.close()
+
+    if prewarm:
+        try:
+            warm_thumbnails(name, scraper, image_urls)
+        except Exception as e:
+            # Данные уже сохранены; миниатюры создаст API при первом запросе
+            print(f"[{name}] Thumbnail pre-warm failed: {str(e)}")
+    return counts
+
+
+async def run_shelter(name: str, scraper_class: Type[BaseBeautifulSoupScraper], full_refresh: bool,
+                      prewarm: bool, limiter: asyncio.Semaphore) -> Optional[Dict[str, int]]:
+    """Запускает приют под общим ограничением; сбой одного приюта не останавливает остальные"""
+    async with limiter:
+        started = perf_counter()
+        try:
+            counts = await asyncio.to_thread(scrape_shelter, name, scraper_class, full_refresh, prewarm)
+        except Exception as e:
+            print(f"[{name}] Error running scraper: {str(e)}")
+            return None
+        print(f"[{name}] Done in {perf_counter() - started:.1f}s")
+        return counts
+
+
+async def run_all(scrapers: Dict[str, Type[BaseBeautifulSoupScraper]], full_refresh: bool,
+                  max_parallel: int, prewarm: bool = PREWARM_THUMBNAILS) -> Dict[str, Optional[Dict[str, int]]]:
+    limiter = asyncio.Semaphore(max_parallel)
+    results = await asyncio.gather(*[
+        run_shelter(name, scraper_class, full_refresh, prewarm, limiter)
+        for name, scraper_class in scrapers.items()
+    ])
+    return dict(zip(scrapers, results))
+
+
+def main(full_refresh: bool = False, shelters: Optional[List[str]] = None,
+         max_parallel: int = MAX_PARALLEL_SHELTERS, prewarm: bool = PREWARM_THUMBNAILS) -> int:
+    """Основная функция для запуска скраперов; возвращает число приютов с ошибкой"""
+    print("\nStarting scraper process...")
+    scrapers = discover_scrapers()
+    if shelters:
+        unknown = [name for name in shelters if name not in scrapers]
+        if unknown:
+            print(f"Unknown scrapers: {', '.join(unknown)}. Available: {', '.join(scrapers)}")
+            return len(unknown)
+        scrapers = {name: scrapers[name] for name in shelters}
+    print(f"Running {len(scrapers)} scraper(s), up to {max_parallel} in parallel: {', '.join(scrapers)}")
+
+    started = perf_counter()
+    try:
+        results = asyncio.run(run_all(scrapers, full_refresh, max_parallel, prewarm))
+    finally:
+        shutdown_parse_pool()
+    failed = [name for name, counts in results.items() if counts is None]
+    print(
+        f"\nFinished {len(results) - len(failed)}/{len(results)} shelters in {perf_counter() - started:.1f}s"
+        + (f"; failed: {', '.join(failed)}" if failed else "")
+    )
+    return len(failed)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Запуск скрапера и синхронизация животных с базой данных")
+    parser.add_argument(
+        "--full-refresh",
+        action="store_true",
+        help="Перезаписать все загруженные строки (включая is_adopted) и после полного обхода удалить животных, "
+             "которых больше нет на сайте, вместо инкрементальной синхронизации"
+    )
+    parser.add_argument(
+        "--shelter",
+        action="append",
+        dest="shelters",
+        metavar="NAME",
+        help="Запустить только указанный скрапер (можно повторять); по умолчанию все найденные"
+    )
+    parser.add_argument(
+        "--max-parallel",
+        type=int,
+        default=MAX_PARALLEL_SHELTERS,
+        help="Сколько приютов скрапить одновременно"
+    )
+    parser.add_argument(
+        "--no-thumbnails",
+        action="store_true",
+        help="Не создавать миниатюры фотографий после синхронизации"
+    )
+    parser.add_argument("--list", action="store_true", help="Показать найденные скраперы и выйти")
+    args = parser.parse_args()
+    if args.list:
+        for name, scraper_class in discover_scrapers().items():
+            print(f"{name}\t{scraper_class.__module__}")
+        sys.exit(0)
+    failed = main(args.full_refresh, args.shelters, max(1, args.max_parallel),
+                  PREWARM_THUMBNAILS and not args.no_thumbnails)
+    sys.exit(1 if failed else 0)
@@ -8,6 +8,7 @@ done
 echo "Database is ready!"
 
 # Запускаем скрапер из корневой директории
+# (API еще не запущен, поэтому сброс его кэша скрапером пропускается - кэш пуст)
 echo "Starting scraper..."
 cd /app/api && python -m scripts.run_scraper
 
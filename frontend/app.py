@@ -1,6 +1,8 @@
 import streamlit as st
 import requests
 import os
+import threading
+from collections import OrderedDict
 from dotenv import load_dotenv
 
 # Загружаем переменные окружения
@@ -9,20 +11,121 @@ load_dotenv()
 # Конфигурация API
 API_URL = os.getenv('API_URL', 'http://api:8000')
 
+# Время жизни кэша ответов API (секунды); после записи кэш сбрасывается явно
+CACHE_TTL = int(os.getenv('FRONTEND_CACHE_TTL', '30'))
+PAGE_SIZES = [12, 24, 48]
+# Колонки, нужные для карточек
+CARD_FIELDS = "id,name,gender,age,description,image_url,is_adopted"
+# Таймаут запросов к API (секунды): зависший API не должен блокировать сессии
+REQUEST_TIMEOUT = float(os.getenv('FRONTEND_REQUEST_TIMEOUT', '10'))
+# Сколько ответов с ETag хранить (ключи включают текст поиска и курсоры)
+ETAG_STORE_SIZE = int(os.getenv('FRONTEND_ETAG_STORE_SIZE', '256'))
+
+class ETagStore:
+    """LRU-хранилище последних ответов с ETag; общее для сессий, поэтому с блокировкой"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+@st.cache_resource
+def etag_store():
+    """Последние ответы с ETag по параметрам запроса (общие для всех сессий)"""
+    return ETagStore(ETAG_STORE_SIZE)
+
 # Функция для получения данных с API
-def get_animals(filters=None):
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def fetch_animals_page(filter_items, cursor, limit):
+    """
+    Одна страница животных и курсор следующей страницы; результат кэшируется по фильтрам и курсору.
+    После истечения TTL запрос условный: при неизмененных данных API отвечает 304
+    и используется сохраненный ответ
+    """
+    params = {**dict(filter_items), "limit": limit, "fields": CARD_FIELDS}
+    if cursor:
+        params["cursor"] = cursor
+    request_key = tuple(sorted(params.items()))
+    cached = etag_store().get(request_key)
+    headers = {"If-None-Match": cached["etag"]} if cached else {}
+
+    response = requests.get(f"{API_URL}/api/animals", params=params, headers=headers, timeout=REQUEST_TIMEOUT)
+    if response.status_code == 304 and cached:
+        return cached["data"], cached["next_cursor"]
+    response.raise_for_status()
+    data = response.json()
+    next_cursor = response.headers.get("X-Next-Cursor")
+    if response.headers.get("ETag"):
+        etag_store().set(request_key, {"etag": response.headers["ETag"], "data": data, "next_cursor": next_cursor})
+    return data, next_cursor
+
+def get_animals(filters, cursor=None, limit=PAGE_SIZES[0]):
+    """Страница животных по фильтрам; при ошибке - пустая страница"""
     try:
-        url = f"{API_URL}/api/animals"
-        response = requests.get(url, params=filters)
-        response.raise_for_status()
-        data = response.json()
-        return data
+        return fetch_animals_page(tuple(sorted(filters.items())), cursor, limit)
     except requests.exceptions.RequestException as e:
         st.error(f"Ошибка при получении данных: {str(e)}")
-        return []
+        return [], None
     except Exception as e:
         st.error(f"Неожиданная ошибка: {str(e)}")
-        return []
+        return [], None
+
+# Функция для получения значений фильтров с количеством животных
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def fetch_facets():
+    response = requests.get(f"{API_URL}/api/facets", timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+def get_facets():
+    try:
+        return fetch_facets()
+    except requests.exceptions.RequestException:
+        return {}
+
+# Миниатюры фотографий из кэша API (не зависят от скорости сайта приюта)
+@st.cache_data(ttl=3600, max_entries=500, show_spinner=False)
+def fetch_thumbnail(animal_id):
+    response = requests.get(f"{API_URL}/api/animals/{animal_id}/thumbnail", timeout=15)
+    response.raise_for_status()
+    return response.content
+
+def get_thumbnail(animal_id):
+    try:
+        return fetch_thumbnail(animal_id)
+    except requests.exceptions.RequestException:
+        return None
+
+def invalidate_cache():
+    """Сбрасывает кэш списков и фасетов после изменения данных"""
+    fetch_animals_page.clear()
+    fetch_facets.clear()
+
+def facet_options(facets, facet, fallback):
+    """Значения фильтра из API (с количеством) или запасной список"""
+    items = facets.get(facet) or [{"value": value, "count": None} for value in fallback]
+    counts = {item["value"]: item["count"] for item in items}
+    return [None] + [item["value"] for item in items], counts
+
+def facet_label(value, counts):
+    if value is None:
+        return "Todos"
+    count = counts.get(value)
+    return f"{value.capitalize()} ({count})" if count is not None else value.capitalize()
 
 # Функция для обновления статуса животного
 def update_animal_status(animal_id: int, is_adopted: bool):
@@ -33,11 +136,13 @@ def update_animal_status(animal_id: int, is_adopted: bool):
         st.write(f"Attempting to update animal {animal_id} status to {is_adopted}")
         response = requests.put(
             f"{API_URL}/api/animals/{animal_id}",
-            json={"is_adopted": is_adopted}
+            json={"is_adopted": is_adopted},
+            timeout=REQUEST_TIMEOUT
         )
         st.write(f"Response status: {response.status_code}")
         st.write(f"Response content: {response.text}")
         response.raise_for_status()
+        invalidate_cache()
         return True
     except requests.exceptions.RequestException as e:
         st.error(f"Ошибка при обновлении статуса: {str(e)}")
@@ -56,20 +161,30 @@ st.set_page_config(
 # Encabezado de la aplicación
 st.title("🐾 Scrapy4Paws - Refugio de Animales")
 
+# Значения фильтров берем из /api/facets
+facets = get_facets()
+gender_options, gender_counts = facet_options(facets, "gender", ["macho", "hembra"])
+age_options, age_counts = facet_options(facets, "age", ["cachorro", "adulto", "abuelo"])
+
 # Создаем боковую панель для фильтров
 with st.sidebar:
     st.header("Filtros")
     
+    # Búsqueda de texto en nombre y descripción
+    search_query = st.text_input("Buscar", placeholder="cariñoso, FIV...")
+    
     # Filtro por género
     gender_filter = st.selectbox(
         "Género",
-        ["Todos", "Macho", "Hembra"]
+        gender_options,
+        format_func=lambda value: facet_label(value, gender_counts)
     )
     
     # Filtro por edad
     age_filter = st.selectbox(
         "Edad",
-        ["Todos", "Cachorro", "Adulto", "Abuelo"]
+        age_options,
+        format_func=lambda value: facet_label(value, age_counts)
     )
     
     # Filtro por estado de adopción
@@ -77,29 +192,53 @@ with st.sidebar:
         "Estado de Adopción",
         ["Todos", "Disponible", "Adoptado"]
     )
+    
+    # Tamaño de página
+    page_size = st.selectbox("Por página", PAGE_SIZES)
 
 # Подготавливаем фильтры для API
 filters = {}
-if gender_filter != "Todos":
-    gender_map = {
-        "Macho": "macho",
-        "Hembra": "hembra"
-    }
-    filters["gender"] = gender_map[gender_filter]
-
-if age_filter != "Todos":
-    age_map = {
-        "Cachorro": "cachorro",
-        "Adulto": "adulto",
-        "Abuelo": "abuelo"
-    }
-    filters["age"] = age_map[age_filter]
+if search_query.strip():
+    filters["q"] = search_query.strip()
+
+if gender_filter:
+    filters["gender"] = gender_filter
+
+if age_filter:
+    filters["age"] = age_filter
 
 if adoption_filter != "Todos":
     filters["is_adopted"] = adoption_filter == "Adoptado"
 
+# Постраничная навигация по курсорам API: курсоры пройденных страниц хранятся в сессии,
+# при смене фильтров или размера страницы возвращаемся на первую страницу
+page_key = (tuple(sorted(filters.items())), page_size)
+if st.session_state.get("page_key") != page_key:
+    st.session_state["page_key"] = page_key
+    st.session_state["page_cursors"] = [None]
+page_cursors = st.session_state["page_cursors"]
+
+def next_page(cursor):
+    st.session_state["page_cursors"].append(cursor)
+
+def previous_page():
+    st.session_state["page_cursors"].pop()
+
 # Получаем данные через API
-animals = get_animals(filters)
+animals, next_cursor = get_animals(filters, page_cursors[-1], page_size)
+
+def render_pagination(position):
+    prev_col, page_col, next_col = st.columns([1, 2, 1])
+    with prev_col:
+        st.button("← Anterior", key=f"prev_{position}", on_click=previous_page,
+                  disabled=len(page_cursors) == 1)
+    with page_col:
+        st.write(f"Página {len(page_cursors)}")
+    with next_col:
+        st.button("Siguiente →", key=f"next_{position}", on_click=next_page, args=(next_cursor,),
+                  disabled=not next_cursor)
+
+render_pagination("top")
 
 # Отображаем карточки животных
 for animal in animals:
@@ -107,7 +246,10 @@ for animal in animals:
         col1, col2 = st.columns([1, 2])
         
         with col1:
-            if animal.get('image_url'):
+            thumbnail = get_thumbnail(animal['id']) if animal.get('image_url') else None
+            if thumbnail:
+                st.image(thumbnail, use_column_width=True)
+            elif animal.get('image_url'):
                 st.image(animal['image_url'], use_column_width=True)
             else:
                 st.image("https://via.placeholder.com/300x200?text=Sin+Imagen", use_column_width=True)
@@ -142,4 +284,9 @@ for animal in animals:
                     else:
                         st.error("No se pudo actualizar el estado de adopción")
         
-        st.markdown("---") 
\ No newline at end of file
+        st.markdown("---") 
+
+if animals:
+    render_pagination("bottom")
+else:
+    st.info("No se encontraron animales")